@@ -0,0 +1,556 @@
+#!/usr/bin/env python
+
+""" Benchmarks for jsonpointer
+
+Run with ``python benchmarks.py``. Each benchmark reports the best time per
+call out of several repetitions. Results can be written to a JSON file with
+``--output`` and compared against an earlier run with ``--compare``::
+
+    python benchmarks.py --output before.json
+    # ... change something ...
+    python benchmarks.py --compare before.json
+
+``--scale`` multiplies the size of the generated documents, ``--filter``
+selects benchmarks by name.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+
+import jsonpointer
+from jsonpointer import JsonPointer, resolve_pointer, resolve_many
+
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Registers a benchmark
+
+    The decorated function receives the scale factor and returns a function
+    to time and the number of calls per repetition.
+    """
+
+    def register(func):
+        BENCHMARKS.append((name, func))
+        return func
+
+    return register
+
+
+def make_items_doc(items=1000, fields=10):
+    """Returns a document with a list of items that have fields members each"""
+    return {
+        'data': {
+            'items': [
+                {'field%d' % f: i * f for f in range(fields)}
+                for i in range(items)
+            ],
+        },
+    }
+
+
+def make_deep_doc(depth=100, width=1):
+    """Returns a document nested depth levels deep
+
+    Every level is an object with width members; the members 'a' lead to the
+    next level. Returns the document and the pointer to its innermost value.
+    """
+    doc = leaf = {}
+    for level in range(depth):
+        for w in range(1, width):
+            leaf['m%d' % w] = w
+        leaf['a'] = leaf = {}
+    leaf['value'] = depth
+    return doc, '/a' * depth + '/value'
+
+
+def make_wide_doc(members=10000):
+    """Returns an object with members members, and a list with as many items"""
+    return {
+        'object': {'member%d' % i: i for i in range(members)},
+        'list': list(range(members)),
+    }
+
+
+def make_large_doc(items=100000):
+    """Returns a document that serializes to about 100 bytes per item"""
+    return {
+        'items': [
+            {'id': i, 'name': 'item %d' % i, 'tags': ['a', 'b', 'c'],
+             'nested': {'value': i * 0.5, 'flag': i % 2 == 0}}
+            for i in range(items)
+        ],
+        'meta': {'version': 1, 'count': items},
+    }
+
+
+# Parsing
+
+@benchmark('parse/simple')
+def bench_parse_simple(scale):
+    return lambda: JsonPointer('/data/items/17/field3'), 100000
+
+
+@benchmark('parse/escaped')
+def bench_parse_escaped(scale):
+    return lambda: JsonPointer('/a~1b/c~0d/~0~1/e~1f~1g/h~0'), 100000
+
+
+@benchmark('parse/long')
+def bench_parse_long(scale):
+    ptr = '/abc' * 100
+    return lambda: JsonPointer(ptr), 10000
+
+
+# Resolving
+
+@benchmark('resolve/deep')
+def bench_resolve_deep(scale):
+    doc, path = make_deep_doc(depth=100 * scale)
+    ptr = JsonPointer(path)
+    return lambda: ptr.resolve(doc), 1000
+
+
+@benchmark('resolve/wide-object')
+def bench_resolve_wide_object(scale):
+    doc = make_wide_doc(10000 * scale)
+    ptr = JsonPointer('/object/member%d' % (5000 * scale))
+    return lambda: ptr.resolve(doc), 100000
+
+
+@benchmark('resolve/wide-list')
+def bench_resolve_wide_list(scale):
+    doc = make_wide_doc(10000 * scale)
+    ptr = JsonPointer('/list/%d' % (5000 * scale))
+    return lambda: ptr.resolve(doc), 100000
+
+
+@benchmark('resolve/missing-default')
+def bench_resolve_missing(scale):
+    doc = make_items_doc(items=10, fields=5)
+    ptr = JsonPointer('/data/items/3/nope')
+    return lambda: ptr.resolve(doc, None), 100000
+
+
+@benchmark('resolve/missing-in-wide-object')
+def bench_resolve_missing_wide(scale):
+    doc = make_wide_doc(10000 * scale)
+    ptr = JsonPointer('/object/nope')
+    return lambda: ptr.resolve(doc, None), 100
+
+
+@benchmark('resolve/lookup-missing')
+def bench_lookup_missing(scale):
+    doc = make_items_doc(items=10, fields=5)
+    ptr = JsonPointer('/data/items/3/nope')
+    return lambda: ptr.lookup(doc), 100000
+
+
+@benchmark('resolve/resolve_pointer')
+def bench_resolve_pointer(scale):
+    doc = make_items_doc(items=20, fields=5)
+    return lambda: resolve_pointer(doc, '/data/items/17/field3'), 100000
+
+
+@benchmark('resolve/compiled')
+def bench_resolve_compiled(scale):
+    doc = make_items_doc(items=20, fields=5)
+    get = JsonPointer('/data/items/17/field3').compile()
+    return lambda: get(doc), 100000
+
+
+@benchmark('resolve/walk')
+def bench_walk(scale):
+    doc = make_wide_doc(100)
+    ptr = JsonPointer('/list/50')
+    lst = doc['list']
+    return lambda: ptr.walk(lst, '50'), 100000
+
+
+@benchmark('resolve/loop-of-resolve_pointer')
+def bench_resolve_loop(scale):
+    doc = make_items_doc(100 * scale, 5)
+    pointers = ['/data/items/%d/field%d' % (i, f)
+                for i in range(100 * scale) for f in range(5)]
+    return lambda: [resolve_pointer(doc, p) for p in pointers], 20
+
+
+@benchmark('resolve/resolve_many')
+def bench_resolve_many(scale):
+    doc = make_items_doc(100 * scale, 5)
+    pointers = ['/data/items/%d/field%d' % (i, f)
+                for i in range(100 * scale) for f in range(5)]
+    return lambda: resolve_many(doc, pointers), 20
+
+
+# Columns
+
+def make_records(count=10000, fields=20):
+    """Returns count small documents with fields nested values each"""
+    return [{'id': i, 'data': {'f%d' % f: i * f for f in range(fields - 1)}}
+            for i in range(count)]
+
+
+def record_pointers(fields=20):
+    return ['/id'] + ['/data/f%d' % f for f in range(fields - 1)]
+
+
+@benchmark('columns/loop-of-resolve_pointer')
+def bench_columns_loop(scale):
+    docs = make_records(10000 * scale)
+    pointers = record_pointers()
+    return lambda: [[resolve_pointer(doc, p, None) for doc in docs] for p in pointers], 1
+
+
+@benchmark('columns/extract_columns')
+def bench_columns_extract(scale):
+    docs = make_records(10000 * scale)
+    pointers = record_pointers()
+    return lambda: jsonpointer.extract_columns(docs, pointers, use_numpy=False), 1
+
+
+# Setting
+
+@benchmark('set/inplace')
+def bench_set_inplace(scale):
+    doc = make_items_doc(items=1000 * scale, fields=10)
+    ptr = JsonPointer('/data/items/500/field3')
+    return lambda: ptr.set(doc, 1), 100000
+
+
+@benchmark('set/copy')
+def bench_set_copy(scale):
+    doc = make_items_doc(items=100 * scale, fields=10)
+    ptr = JsonPointer('/data/items/50/field3')
+    return lambda: ptr.set(doc, 1, inplace=False), 10
+
+
+@benchmark('set/copy-shared')
+def bench_set_copy_shared(scale):
+    doc = make_items_doc(items=100 * scale, fields=10)
+    ptr = JsonPointer('/data/items/50/field3')
+    return lambda: ptr.set(doc, 1, inplace=False, share_structure=True), 10000
+
+
+# Pointer operations
+
+@benchmark('ops/join')
+def bench_join(scale):
+    ptr = JsonPointer('/data/items')
+    suffix = JsonPointer('/17/field3')
+    return lambda: ptr.join(suffix), 100000
+
+
+@benchmark('ops/from_parts')
+def bench_from_parts(scale):
+    parts = ['data', 'items', 17, 'field3']
+    return lambda: JsonPointer.from_parts(parts), 100000
+
+
+@benchmark('ops/contains')
+def bench_contains(scale):
+    ptr = JsonPointer('/data/items/17/field3')
+    prefix = JsonPointer('/data/items')
+    return lambda: ptr.contains(prefix), 100000
+
+
+@benchmark('ops/parent')
+def bench_parent(scale):
+    ptr = JsonPointer('/data/items/17/field3')
+    return lambda: ptr.parent, 100000
+
+
+@benchmark('ops/common_prefix')
+def bench_common_prefix(scale):
+    ptr = JsonPointer('/data/items/17/field3')
+    other = JsonPointer('/data/items/18/field3')
+    return lambda: ptr.common_prefix(other), 100000
+
+
+@benchmark('ops/relative_to')
+def bench_relative_to(scale):
+    ptr = JsonPointer('/data/items/17/field3')
+    base = JsonPointer('/data/items/18/field3')
+    return lambda: ptr.relative_to(base), 100000
+
+
+# Indexed documents
+
+def make_full_index(scale):
+    """Returns a PointerIndex of make_large_doc() with about maxsize recorded nodes"""
+    index = jsonpointer.PointerIndex(make_large_doc(10000 * scale))
+    for i in range(index.maxsize // 3):
+        index.resolve('/items/%d/nested/value' % i)
+    return index
+
+
+@benchmark('index/resolve')
+def bench_index_resolve(scale):
+    index = make_full_index(scale)
+    return lambda: index.resolve('/items/17/nested/value'), 100000
+
+
+@benchmark('index/resolve-miss')
+def bench_index_resolve_miss(scale):
+    index = make_full_index(scale)
+
+    def resolve():
+        index.invalidate('/items/9999')
+        index.resolve('/items/9999/nested/value')
+
+    return resolve, 10000
+
+
+@benchmark('index/set')
+def bench_index_set(scale):
+    index = make_full_index(scale)
+    return lambda: index.set('/x', 1), 10000
+
+
+def make_prefixes(count):
+    """Returns count pointers two to four levels deep"""
+    return [JsonPointer('/tenant%d/data/%d' % (i % 100, i) + '/x' * (i % 3))
+            for i in range(count)]
+
+
+@benchmark('ops/prefix-check-contains')
+def bench_prefix_contains(scale):
+    prefixes = make_prefixes(1000 * scale)
+    ptr = JsonPointer('/tenant7/data/999999/x/y')
+    return lambda: any(ptr.contains(prefix) for prefix in prefixes), 100
+
+
+@benchmark('ops/prefix-check-PointerSet')
+def bench_prefix_pointerset(scale):
+    prefixes = jsonpointer.PointerSet(make_prefixes(1000 * scale))
+    ptr = JsonPointer('/tenant7/data/999999/x/y')
+    return lambda: prefixes.covers(ptr), 100000
+
+
+@benchmark('ops/path')
+def bench_path(scale):
+    ptrs = [JsonPointer.from_parts(['data', 'items', i, 'a/b']) for i in range(1000)]
+    return lambda: [p.path for p in ptrs], 100
+
+
+@benchmark('ops/hash')
+def bench_hash(scale):
+    ptrs = [JsonPointer.from_parts(['data', 'items', i]) for i in range(1000)]
+    return lambda: set(ptrs), 100
+
+
+@benchmark('ops/iter_pointers')
+def bench_iter_pointers(scale):
+    doc = make_items_doc(items=1000 * scale, fields=10)
+    return lambda: list(jsonpointer.iter_pointers(doc)), 1
+
+
+@benchmark('ops/flatten')
+def bench_flatten(scale):
+    doc = make_items_doc(items=1000 * scale, fields=10)
+    return lambda: jsonpointer.flatten(doc), 1
+
+
+# Concurrency
+
+THREADS = 8
+
+
+def _contention(read, write, scale):
+    """Returns a benchmark function for THREADS threads that mostly read
+
+    Each thread works on its own item; it reads five of its fields at a time
+    (as a consistent view) nine times for every write.
+    """
+
+    executor = concurrent.futures.ThreadPoolExecutor(THREADS)
+    ops = 1000 * scale
+
+    def worker(thread):
+        reads = [JsonPointer('/data/items/%d/field%d' % (thread, f)) for f in range(5)]
+        written = JsonPointer('/data/items/%d/field9' % thread)
+        for i in range(ops):
+            if i % 10:
+                read(reads)
+            else:
+                write(written, i)
+
+    def run():
+        list(executor.map(worker, range(THREADS)))
+
+    return run, 1
+
+
+@benchmark('store/global-lock')
+def bench_store_global_lock(scale):
+    doc = make_items_doc(items=100, fields=10)
+    lock = threading.Lock()
+
+    def read(pointers):
+        with lock:
+            return [ptr.resolve(doc) for ptr in pointers]
+
+    def write(ptr, value):
+        with lock:
+            ptr.set(doc, value)
+
+    return _contention(read, write, scale)
+
+
+@benchmark('store/DocumentStore')
+def bench_store(scale):
+    store = jsonpointer.DocumentStore(make_items_doc(items=100, fields=10))
+
+    def read(pointers):
+        doc = store.snapshot()
+        return [ptr.resolve(doc) for ptr in pointers]
+
+    return _contention(read, store.set, scale)
+
+
+# Command line
+
+_tempdir = tempfile.TemporaryDirectory()
+
+
+def large_json_file(scale):
+    """Returns the path of a file with make_large_doc(), written once per scale"""
+
+    path = os.path.join(_tempdir.name, 'large-%d.json' % scale)
+    if not os.path.exists(path):
+        with open(path, 'w') as f:
+            json.dump(make_large_doc(100000 * scale), f)
+    return path
+
+
+def _cli_benchmark(*options):
+    """Returns a benchmark that runs bin/jsonpointer on a large file"""
+
+    def bench_cli(scale):
+        path = large_json_file(scale)
+
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'bin', 'jsonpointer')
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, [os.path.dirname(jsonpointer.__file__), env.get('PYTHONPATH')]))
+        args = [sys.executable, script] + list(options) + ['/meta/version', path]
+
+        def run():
+            subprocess.run(args, check=True, env=env, stdout=subprocess.DEVNULL)
+
+        return run, 1
+
+    return bench_cli
+
+
+benchmark('cli/load')(_cli_benchmark())
+benchmark('cli/stream')(_cli_benchmark('--stream'))
+benchmark('cli/index')(_cli_benchmark('--index'))
+benchmark('cli/cache')(_cli_benchmark('--cache-db', os.path.join(_tempdir.name, 'cache.sqlite')))
+
+
+def start_server(scale):
+    """Serves large_json_file() from a background thread; returns the socket"""
+
+    socket_path = os.path.join(_tempdir.name, 'server-%d.sock' % scale)
+    if os.path.exists(socket_path):
+        return socket_path
+
+    server = jsonpointer.JsonPointerServer([large_json_file(scale)])
+    started = threading.Event()
+
+    async def serve():
+        await server.start(socket_path)
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return socket_path
+
+
+@benchmark('server/request')
+def bench_server_request(scale):
+    client = jsonpointer.JsonPointerClient(start_server(scale))
+    return lambda: client.resolve('/meta/version'), 1000
+
+
+@benchmark('cli/connect')
+def bench_cli_connect(scale):
+    socket_path = start_server(scale)
+    return _cli_benchmark('--connect', socket_path)(scale)
+
+
+def best_of(func, number, repeat=5):
+    """Returns the best time in seconds of number calls to func"""
+    return min(timeit.repeat(func, number=number, repeat=repeat))
+
+
+def run(names, scale, repeat):
+    results = {}
+    for name, setup in BENCHMARKS:
+        if name not in names:
+            continue
+
+        func, number = setup(scale)
+        results[name] = best_of(func, number, repeat) / number
+    return results
+
+
+def format_time(seconds):
+    for unit, factor in (('s', 1), ('ms', 1e3), ('us', 1e6)):
+        if seconds * factor >= 1:
+            return '%.2f %s' % (seconds * factor, unit)
+    return '%.0f ns' % (seconds * 1e9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark jsonpointer')
+    parser.add_argument('--filter', default='',
+                        help='Only run benchmarks whose name contains this')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='Size factor for the generated documents')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of repetitions of each benchmark')
+    parser.add_argument('--output', help='Write the results to a JSON file')
+    parser.add_argument('--compare', help='Compare with results from a JSON file')
+    args = parser.parse_args()
+
+    names = [name for name, _ in BENCHMARKS if args.filter in name]
+    results = run(names, args.scale, args.repeat)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+
+    for name in names:
+        line = '%-36s %12s' % (name, format_time(results[name]))
+        if name in previous:
+            line += '   %5.2fx of previous' % (results[name] / previous[name])
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'version': jsonpointer.__version__,
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'scale': args.scale,
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -32,23 +32,42 @@
 
 # Will be parsed by setup.py to determine package metadata
 __author__ = 'Stefan Kögl <stefan@skoegl.net>'
-__version__ = '3.1.1'
+__version__ = '4.0.0'
 __website__ = 'https://github.com/stefankoegl/python-json-pointer'
 __license__ = 'Modified BSD License'
 
+import contextlib
 import copy
+import functools
+import json
+import mmap
+import os
 import re
-from collections.abc import Mapping, Sequence
-from itertools import tee, chain
+import reprlib
+import sys
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict, namedtuple
+from collections.abc import Mapping, MutableSet, Sequence
+from itertools import chain, islice, tee
 
 _nothing = object()
 
+# module-wide cache of parsed pointers, see enable_pointer_cache()
+_pointer_cache = None
 
-def set_pointer(doc, pointer, value, inplace=True):
+# the original methods of JsonPointer while instrumentation is enabled, see
+# enable_instrumentation()
+_uninstrumented = None
+
+
+def set_pointer(doc, pointer, value, inplace=True, share_structure=False):
     """Resolves a pointer against doc and sets the value of the target within doc.
 
     With inplace set to true, doc is modified as long as pointer is not the
-    root.
+    root. Otherwise a modified copy is returned; see JsonPointer.set() for
+    share_structure.
 
     >>> obj = {'foo': {'anArray': [ {'prop': 44}], 'another prop': {'baz': 'A string' }}}
 
@@ -66,8 +85,8 @@ def set_pointer(doc, pointer, value, inplace=True):
     True
     """
 
-    pointer = JsonPointer(pointer)
-    return pointer.set(doc, value, inplace)
+    pointer = _parse_pointer(pointer)
+    return pointer.set(doc, value, inplace, share_structure)
 
 
 def resolve_pointer(doc, pointer, default=_nothing):
@@ -106,10 +125,700 @@ def resolve_pointer(doc, pointer, default=_nothing):
     True
     """
 
-    pointer = JsonPointer(pointer)
+    pointer = _parse_pointer(pointer)
     return pointer.resolve(doc, default)
 
 
+def lookup_pointer(doc, pointer, default=None):
+    """Resolves pointer against doc without raising exceptions
+
+    Returns the target and None, or default and a Miss, see
+    JsonPointer.lookup().
+
+    >>> lookup_pointer({'foo': {'bar': 1}}, '/foo/baz')
+    (None, Miss(step=1, part='baz', reason='missing-member'))
+    """
+
+    pointer = _parse_pointer(pointer)
+    return pointer.lookup(doc, default)
+
+
+def delete_pointer(doc, pointer, inplace=True, share_structure=False):
+    """Resolves a pointer against doc and removes the target from doc.
+
+    >>> obj = {'foo': {'anArray': [ {'prop': 44}], 'another prop': {'baz': 'A string' }}}
+
+    >>> delete_pointer(obj, '/foo/anArray/0') == \
+    {'foo': {'anArray': [], 'another prop': {'baz': 'A string'}}}
+    True
+    """
+
+    pointer = _parse_pointer(pointer)
+    return pointer.delete(doc, inplace, share_structure)
+
+
+def _build_trie(pointers):
+    """Arranges pointers in a trie of [children by part, indices] nodes
+
+    Children are kept in the order in which they are first seen.
+    """
+
+    root = [{}, []]
+    for index, ptr in enumerate(pointers):
+        node = root
+        for part in ptr._parts:
+            child = node[0].get(part)
+            if child is None:
+                child = node[0][part] = [{}, []]
+            node = child
+        node[1].append(index)
+
+    return root
+
+
+def apply_many(doc, items, inplace=True, share_structure=False):
+    """Sets many values in doc, walking each shared parent only once
+
+    items is an iterable of (pointer, value) pairs. The result is the same
+    as that of applying the writes one after another: a write replaces
+    whatever earlier writes put below its pointer. The writes are grouped
+    by pointer prefix: a write to a pointer is applied before the writes to
+    pointers below it, and otherwise writes keep their relative order, so
+    several appends to the same list ("-") happen in the given order.
+
+    With inplace set to false, doc is copied once: deeply by default, or
+    only along the written paths if share_structure is set. A failing write
+    in inplace mode leaves the preceding writes applied.
+
+    >>> obj = {'foo': {'bar': [1]}, 'baz': 0}
+    >>> apply_many(obj, [('/foo/bar/-', 2), ('/baz', 1), ('/foo/bar/-', 3),
+    ...                  ('/foo/qux', {}), ('/foo/qux/x', 4)])
+    {'foo': {'bar': [1, 2, 3], 'qux': {'x': 4}}, 'baz': 1}
+    >>> apply_many(obj, [('/foo/qux/x', 5), ('/foo/qux', {'y': 1})])
+    {'foo': {'bar': [1, 2, 3], 'qux': {'y': 1}}, 'baz': 1}
+    """
+
+    items = [(_parse_pointer(p), value) for p, value in items]
+
+    # drop the writes that a later write to an ancestor replaces
+    written = set()
+    kept = []
+    for ptr, value in reversed(items):
+        parts = ptr._parts
+        if not any(parts[:depth] in written for depth in range(len(parts))):
+            kept.append((ptr, value))
+        written.add(parts)
+    kept.reverse()
+
+    pointers = [ptr for ptr, _ in kept]
+    values = [value for _, value in kept]
+    root = _build_trie(pointers)
+
+    if root[1]:
+        if inplace:
+            raise JsonPointerException('Cannot set root in place')
+        doc = values[root[1][-1]]
+
+    if not inplace:
+        doc = copy.copy(doc) if share_structure else copy.deepcopy(doc)
+
+    walk = pointers[0].walk if pointers else None
+    stack = [(root, doc)]
+    while stack:
+        node, container = stack.pop()
+        for part, (children, indices) in node[0].items():
+            key = JsonPointer.get_part(container, part)
+
+            if indices:
+                if isinstance(container, Sequence) and key == '-':
+                    for index in indices:
+                        container.append(values[index])
+                else:
+                    container[key] = values[indices[-1]]
+
+            if children:
+                child = walk(container, part)
+                if not inplace and not isinstance(child, EndOfList):
+                    # copy containers on the way down, and new values that
+                    # are written into, so that the inputs stay untouched
+                    if share_structure:
+                        child = container[key] = copy.copy(child)
+                    elif indices:
+                        child = container[key] = copy.deepcopy(child)
+                stack.append(([children, []], child))
+
+    return doc
+
+
+def delete_many(doc, pointers, inplace=True, share_structure=False):
+    """Removes the targets of many pointers from doc
+
+    All pointers refer to positions in the original doc; array elements are
+    removed from the highest index down so that they do not shift each
+    other. Removing a target implies removing everything below it.
+
+    With inplace set to false, doc is copied once: deeply by default, or
+    only along the affected paths if share_structure is set.
+
+    >>> obj = {'foo': ['a', 'b', 'c', 'd'], 'bar': {'x': 1, 'y': 2}}
+    >>> delete_many(obj, ['/foo/0', '/foo/2', '/bar/x', '/bar/x'])
+    {'foo': ['b', 'd'], 'bar': {'y': 2}}
+    """
+
+    pointers = [_parse_pointer(p) for p in pointers]
+    root = _build_trie(pointers)
+
+    if root[1]:
+        raise JsonPointerException('Cannot delete root')
+
+    if not inplace:
+        doc = copy.copy(doc) if share_structure else copy.deepcopy(doc)
+
+    copy_children = share_structure and not inplace
+    walk = pointers[0].walk if pointers else None
+    stack = [(root, doc)]
+    while stack:
+        node, container = stack.pop()
+        deleted = []
+        for part, (children, indices) in node[0].items():
+            key = JsonPointer.get_part(container, part)
+            if indices:
+                deleted.append(key)
+            elif children:
+                child = walk(container, part)
+                if copy_children and not isinstance(child, EndOfList):
+                    child = container[key] = copy.copy(child)
+                stack.append(([children, []], child))
+
+        if isinstance(container, Sequence):
+            deleted.sort(key=lambda k: -1 if k == '-' else k, reverse=True)
+
+        for key in deleted:
+            _delete_part(container, key)
+
+    return doc
+
+
+def resolve_many(doc, pointers, default=_nothing, defaults=None):
+    """Resolves many pointers against doc in one traversal
+
+    Returns the referenced objects in the order of pointers. Prefixes shared
+    between pointers are walked only once. Pointers that cannot be resolved
+    yield their default from defaults (a mapping from the pointers, or a
+    sequence in the order of pointers), or else default. If neither has a
+    default for a pointer that cannot be resolved, the JsonPointerException
+    of the first such pointer (in input order) is raised after the
+    traversal.
+
+    >>> obj = {'data': {'items': [{'a': 1, 'b': 2}, {'a': 3}]}}
+
+    >>> resolve_many(obj, ['/data/items/0/a', '/data/items/0/b', '/data/items/1/a'])
+    [1, 2, 3]
+
+    >>> resolve_many(obj, ['/data/items/1/b', '/data/items/1/a'], None)
+    [None, 3]
+
+    >>> resolve_many(obj, ['/data/items/1/b', '/data/items/2'], defaults=[0, {}])
+    [0, {}]
+    """
+
+    pointers = list(pointers)
+    if defaults is None:
+        results = [default] * len(pointers)
+    else:
+        if not isinstance(defaults, Mapping):
+            defaults = dict(zip(pointers, defaults))
+        results = [defaults.get(p, default) for p in pointers]
+
+    pointers = [_parse_pointer(p) for p in pointers]
+    if not pointers:
+        return []
+
+    walk = pointers[0].walk
+    errors = {}
+
+    root = _build_trie(pointers)
+    stack = [(root, doc)]
+    while stack:
+        node, subdoc = stack.pop()
+        for index in node[1]:
+            results[index] = subdoc
+
+        for part, child in node[0].items():
+            try:
+                stack.append((child, walk(subdoc, part)))
+            except JsonPointerException as ex:
+                # every pointer below this step fails the same way
+                failed = [child]
+                while failed:
+                    failed_node = failed.pop()
+                    for index in failed_node[1]:
+                        if results[index] is _nothing:
+                            errors[index] = ex
+                    failed.extend(failed_node[0].values())
+
+    if errors:
+        raise errors[min(errors)]
+
+    return results
+
+
+def extract_columns(docs, pointers, defaults=None, chunk_size=10000, use_numpy=None):
+    """Resolves the same pointers against many documents, column by column
+
+    Returns a dict that maps each pointer to a Column of the targets in all
+    docs. The pointers are compiled once, and docs are consumed in chunks of
+    chunk_size. Columns of booleans, integers and numbers are stored in
+    arrays of type 'b', 'q' and 'd'; other columns are lists.
+
+    Targets that cannot be resolved, including the end of an array ("-"),
+    are marked in the missing mask of the column and filled in with the default of the pointer, if defaults (a
+    mapping from the pointers, or a sequence in the order of pointers) has
+    one, or with 0, 0.0, False or None depending on the type of the column.
+
+    With use_numpy set, or if it is None and NumPy is installed, the values
+    and masks are NumPy arrays instead.
+
+    >>> docs = [{'id': 1, 'price': 2.5}, {'id': 2}, {'id': 3, 'price': 4}]
+    >>> columns = extract_columns(docs, ['/id', '/price'], use_numpy=False)
+    >>> columns['/id']
+    Column(values=array('q', [1, 2, 3]), missing=array('b', [0, 0, 0]))
+    >>> columns['/price']
+    Column(values=array('d', [2.5, 0.0, 4.0]), missing=array('b', [0, 1, 0]))
+    """
+
+    pointers = list(pointers)
+    if defaults is None:
+        defaults = {}
+    elif not isinstance(defaults, Mapping):
+        defaults = dict(zip(pointers, defaults))
+
+    getters = [_compile_present(_parse_pointer(p)) for p in pointers]
+    builders = [_ColumnBuilder(defaults.get(p, _nothing)) for p in pointers]
+
+    missing = object()
+    docs = iter(docs)
+    while True:
+        chunk = list(islice(docs, chunk_size))
+        if not chunk:
+            break
+
+        for get, builder in zip(getters, builders):
+            builder.extend([get(doc, missing) for doc in chunk], missing)
+
+    if use_numpy is None:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            use_numpy = False
+        else:
+            use_numpy = True
+
+    return {p: builder.column(use_numpy) for p, builder in zip(pointers, builders)}
+
+
+def _compile_present(ptr):
+    """Compiles ptr, treating the end of an array ("-") as missing"""
+
+    get = ptr.compile()
+    if not ptr._parts or ptr._parts[-1] != '-':
+        return get
+
+    def get_present(doc, default=_nothing):
+        value = get(doc, default)
+        if isinstance(value, EndOfList):
+            if default is _nothing:
+                raise JsonPointerException("'%s' refers to the end of an array" % (ptr,))
+            return default
+        return value
+
+    return get_present
+
+
+class _ColumnBuilder:
+    """Collects the values of one column of extract_columns()"""
+
+    # typecodes of the arrays for columns of these types; 'O' stands for a
+    # list of arbitrary objects
+    TYPECODES = {bool: 'b', int: 'q', float: 'd'}
+    PLACEHOLDERS = {'b': False, 'q': 0, 'd': 0.0, 'O': None}
+
+    def __init__(self, default=_nothing):
+        self.default = default
+        self.typecode = None
+        self.values = []
+        self.missing = array('b')
+
+    def _typecode(self, values):
+        typecode = self.typecode
+        for value_type in set(map(type, values)):
+            new = self.TYPECODES.get(value_type, 'O')
+            if typecode is None or typecode == new:
+                typecode = new
+            elif {typecode, new} == {'q', 'd'}:
+                typecode = 'd'
+            else:
+                return 'O'
+        return typecode
+
+    def _convert(self, typecode):
+        """Changes the storage of the values collected so far"""
+
+        values = self.values
+        if typecode == 'O':
+            values = values.tolist() if isinstance(values, array) else values
+            if self.typecode == 'b':
+                values = [bool(value) for value in values]
+            if self.default is _nothing:
+                placeholder = self.PLACEHOLDERS['O']
+                values = [placeholder if missing else value
+                          for value, missing in zip(values, self.missing)]
+        elif self.typecode is None:
+            # only missing values so far
+            values = array(typecode, [self.PLACEHOLDERS[typecode]] * len(values))
+        else:
+            values = array(typecode, values)
+
+        self.values = values
+        self.typecode = typecode
+
+    def extend(self, values, missing):
+        mask = [value is missing for value in values]
+        if any(mask):
+            default = self.default
+            present = [value for value in values if value is not missing]
+            if default is not _nothing:
+                present.append(default)
+        else:
+            present = values
+
+        typecode = self._typecode(present)
+        if typecode != self.typecode:
+            self._convert(typecode)
+
+        if any(mask):
+            fill = self.default
+            if fill is _nothing:
+                fill = self.PLACEHOLDERS.get(typecode)
+            values = [fill if m else value for value, m in zip(values, mask)]
+
+        size = len(self.values)
+        try:
+            self.values.extend(values)
+        except OverflowError:
+            # integers that do not fit into 64 bits
+            del self.values[size:]
+            self._convert('O')
+            self.values.extend(values)
+        self.missing.extend(mask)
+
+    def column(self, use_numpy=False):
+        values = self.values
+        if not use_numpy:
+            return Column(values, self.missing)
+
+        import numpy
+        missing = numpy.frombuffer(self.missing, dtype=bool)
+        if isinstance(values, array):
+            dtype = {'b': bool, 'q': numpy.int64, 'd': numpy.float64}[self.typecode]
+            return Column(numpy.frombuffer(values, dtype=dtype), missing)
+        return Column(numpy.fromiter(values, dtype=object, count=len(values)), missing)
+
+
+def iter_pointers(doc, leaves_only=False, max_depth=None, as_strings=False):
+    """Yields (pointer, value) for the nodes of doc in document order
+
+    Mappings and sequences (except strings) are containers whose members
+    are visited; everything else is a leaf. With leaves_only set, only leaves,
+    empty containers and containers at max_depth are yielded. max_depth
+    limits how many levels below the root are visited. With as_strings set,
+    the escaped paths are yielded instead of JsonPointer objects.
+
+    The document is walked without recursion, so there is no limit on its
+    depth. Paths are built by extending the path of the parent.
+
+    >>> doc = {'a': [1, {'b/c': 2}], 'd': {}}
+    >>> [(str(ptr), value) for ptr, value in iter_pointers(doc, leaves_only=True)]
+    [('/a/0', 1), ('/a/1/b~1c', 2), ('/d', {})]
+    >>> [path for path, _ in iter_pointers(doc, max_depth=1, as_strings=True)]
+    ['', '/a', '/d']
+    """
+
+    members = _members
+
+    def make(parts, path):
+        return path if as_strings else JsonPointer._from_parsed(parts, path)
+
+    root_members = members(doc) if max_depth != 0 else None
+    stack = []
+    if root_members is not None:
+        first = next(root_members, _nothing)
+        if first is not _nothing:
+            stack.append(((), '', chain([first], root_members)))
+
+    if not leaves_only or not stack:
+        yield make((), ''), doc
+
+    while stack:
+        parts, path, it = stack[-1]
+        for key, value in it:
+            key = str(key)
+            child_parts = None if as_strings else parts + (key,)
+            child_path = _child_path(path, key)
+
+            child_members = None
+            if max_depth is None or len(stack) < max_depth:
+                child_members = members(value)
+                if child_members is not None:
+                    first = next(child_members, _nothing)
+                    if first is _nothing:
+                        child_members = None
+                    else:
+                        child_members = chain([first], child_members)
+
+            if not leaves_only or child_members is None:
+                yield make(child_parts, child_path), value
+
+            if child_members is not None:
+                stack.append((child_parts, child_path, child_members))
+                break
+        else:
+            stack.pop()
+
+
+def _members(node):
+    """Returns an iterator over the (key, value) members of a container
+
+    Returns None if node is not a mapping or a (non-string) sequence.
+    """
+    if isinstance(node, Mapping):
+        return iter(node.items())
+    if _is_array(node):
+        return enumerate(node)
+    return None
+
+
+def _child_path(path, part):
+    """Appends the (unescaped) part to the escaped path"""
+    if '~' in part or '/' in part:
+        return path + '/' + escape(part)
+    return path + '/' + part
+
+
+def flatten(doc, max_depth=None):
+    """Returns a dict that maps the paths of all leaves of doc to their values
+
+    >>> flatten({'a': [1, {'b': 2}], 'c': {}})
+    {'/a/0': 1, '/a/1/b': 2, '/c': {}}
+    """
+    return dict(iter_pointers(doc, leaves_only=True, max_depth=max_depth,
+                              as_strings=True))
+
+
+def unflatten(items):
+    """Builds a document from (pointer, value) pairs, the inverse of flatten()
+
+    items is a mapping or an iterable of pairs. Containers on the way to the
+    values are created as dicts; containers whose members are exactly "0"
+    to "n-1" are turned into lists.
+
+    >>> unflatten({'/a/0': 1, '/a/1/b': 2, '/c': {}})
+    {'a': [1, {'b': 2}], 'c': {}}
+    """
+
+    if isinstance(items, Mapping):
+        items = items.items()
+
+    root = {}
+    root_value = _nothing
+    created = []
+    created_ids = {id(root)}
+
+    for pointer, value in items:
+        ptr = _parse_pointer(pointer)
+        parts = ptr._parts
+        if not parts:
+            if root_value is not _nothing:
+                raise JsonPointerException("Duplicate pointer '%s'" % (ptr,))
+            root_value = value
+            continue
+
+        node = root
+        for part in parts[:-1]:
+            child = node.get(part, _nothing)
+            if child is _nothing:
+                child = node[part] = {}
+                created.append((node, part, child))
+                created_ids.add(id(child))
+            elif id(child) not in created_ids:
+                raise JsonPointerException("Pointer '%s' goes through a leaf" % (ptr,))
+            node = child
+
+        if parts[-1] in node:
+            raise JsonPointerException("Duplicate pointer '%s'" % (ptr,))
+        node[parts[-1]] = value
+
+    if root_value is not _nothing:
+        if root:
+            raise JsonPointerException("Pointer '' goes through a leaf")
+        return root_value
+
+    # children were created after their parents
+    for parent, key, node in reversed(created):
+        parent[key] = _as_list(node)
+
+    return _as_list(root)
+
+
+def _as_list(node):
+    """Returns node as a list if its keys are "0" to "n-1", else node"""
+    if node and all(str(i) in node for i in range(len(node))):
+        return [node[str(i)] for i in range(len(node))]
+    return node
+
+
+def enable_pointer_cache(maxsize=1024):
+    """Enables a module-wide cache of parsed pointers and returns it
+
+    Once enabled, resolve_pointer(), set_pointer() and the other functions
+    that accept pointer strings look up the strings in the cache instead of
+    parsing them again. Calling it again replaces the cache with a new one.
+
+    >>> cache = enable_pointer_cache(maxsize=16)
+    >>> resolve_pointer({'a': [1, 2]}, '/a/1')
+    2
+    >>> resolve_pointer({'a': [3, 4]}, '/a/1')
+    4
+    >>> cache.info()
+    CacheInfo(hits=1, misses=1, evictions=0, maxsize=16, currsize=1)
+    >>> disable_pointer_cache()
+    """
+    global _pointer_cache
+    _pointer_cache = PointerCache(maxsize)
+    return _pointer_cache
+
+
+def disable_pointer_cache():
+    """Disables (and discards) the module-wide pointer cache"""
+    global _pointer_cache
+    _pointer_cache = None
+
+
+def get_pointer_cache():
+    """Returns the module-wide pointer cache, or None if it is disabled"""
+    return _pointer_cache
+
+
+def enable_instrumentation(*sinks):
+    """Reports the resolve(), set() and delete() calls of all pointers to sinks
+
+    Each sink is called with an Event for every call, in the thread that
+    made it; PointerStats is a sink that aggregates them. The methods of
+    JsonPointer are replaced by instrumented versions until
+    disable_instrumentation() is called, so that there is no overhead while
+    instrumentation is disabled. Functions returned by JsonPointer.compile()
+    are not instrumented.
+
+    >>> stats = PointerStats()
+    >>> enable_instrumentation(stats)
+    >>> resolve_pointer({'a': [1]}, '/a/1', None)
+    >>> disable_instrumentation()
+    >>> stats.failures
+    Counter({'out-of-bounds': 1})
+    """
+    global _uninstrumented
+    disable_instrumentation()
+
+    originals = {name: JsonPointer.__dict__[name] for name in ('resolve', 'get', 'set', 'delete')}
+    JsonPointer.resolve = JsonPointer.get = _instrument('resolve', originals['resolve'], sinks)
+    JsonPointer.set = _instrument('set', originals['set'], sinks)
+    JsonPointer.delete = _instrument('delete', originals['delete'], sinks)
+    _uninstrumented = originals
+
+
+def disable_instrumentation():
+    """Restores the uninstrumented methods of JsonPointer"""
+    global _uninstrumented
+    if _uninstrumented is not None:
+        for name, method in _uninstrumented.items():
+            setattr(JsonPointer, name, method)
+        _uninstrumented = None
+
+
+def _instrument(operation, method, sinks):
+    """Wraps a method of JsonPointer so that its calls are reported to sinks"""
+
+    @functools.wraps(method)
+    def instrumented(self, doc, *args, **kwargs):
+        error = None
+        start = time.perf_counter()
+        try:
+            return method(self, doc, *args, **kwargs)
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            event = _trace(operation, self, doc, duration, error)
+            for sink in sinks:
+                sink(event)
+
+    return instrumented
+
+
+def _trace(operation, ptr, doc, duration, error):
+    """Builds the Event of a call by walking the pointer again
+
+    This happens after the call has been timed; for set() and delete(), the
+    last step is only walked if the call failed.
+    """
+
+    parts = ptr._parts
+    last = len(parts) if operation == 'resolve' or error is not None else len(parts) - 1
+    node_types = []
+    failure = None
+
+    for part in parts[:last]:
+        node_types.append(type(doc).__name__)
+        try:
+            doc = ptr.walk(doc, part)
+        except JsonPointerException:
+            failure = _failure_reason(doc, part)
+            break
+    else:
+        if last < len(parts):
+            node_types.append(type(doc).__name__)
+
+    if failure is None and error is not None:
+        failure = type(error).__name__
+
+    steps = len(node_types) - (failure is not None)
+    return Event(operation, ptr, duration, steps, tuple(node_types), failure)
+
+
+def _failure_reason(doc, part):
+    """Returns the category of a failed walk() from doc along part"""
+
+    if isinstance(doc, Sequence):
+        if part != '-' and not JsonPointer._RE_ARRAY_INDEX.fullmatch(str(part)):
+            return 'invalid-index'
+        return 'out-of-bounds'
+    if isinstance(doc, Mapping) or hasattr(doc, '__getitem__'):
+        return 'missing-member'
+    return 'not-a-container'
+
+
+def _parse_pointer(pointer):
+    """Parses pointer, going through the pointer cache if it is enabled"""
+    if isinstance(pointer, JsonPointer):
+        return pointer
+
+    cache = _pointer_cache
+    if cache is None:
+        return JsonPointer(pointer)
+    return cache.get(pointer)
+
+
 def pairwise(iterable):
     """ Transforms a list to a list of tuples of adjacent items
 
@@ -131,7 +840,63 @@ def pairwise(iterable):
 
 
 class JsonPointerException(Exception):
-    pass
+    """Raised for pointers that are invalid or cannot be resolved
+
+    Messages about documents are only formatted when they are needed, and
+    the documents in them are shortened, so that large documents do not
+    end up in them in full.
+
+    >>> try:
+    ...     resolve_pointer({'a': list(range(100))}, '/x')
+    ... except JsonPointerException as ex:
+    ...     print(ex)
+    member 'x' not found in {'a': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ...]}
+    """
+
+    # the arguments of a message that is formatted lazily, see _deferred()
+    _format_args = None
+
+    @classmethod
+    def _deferred(cls, message, *args):
+        """Returns an exception whose message is message % args, formatted lazily"""
+        ex = cls(message)
+        ex._format_args = args
+        return ex
+
+    def __str__(self):
+        if self._format_args is None:
+            return super().__str__()
+        return self.args[0] % tuple([_shorten(arg) for arg in self._format_args])
+
+    def __repr__(self):
+        if self._format_args is None:
+            return super().__repr__()
+        return '%s(%r)' % (type(self).__name__, str(self))
+
+    def __reduce__(self):
+        if self._format_args is None:
+            return super().__reduce__()
+        return (type(self), (str(self),))
+
+
+# representations of the values in exception messages
+_message_repr = reprlib.Repr()
+_message_repr.maxlevel = 3
+_message_repr.maxdict = _message_repr.maxlist = _message_repr.maxtuple = 10
+_message_repr.maxstring = _message_repr.maxother = 100
+_MAX_MESSAGE_STRING = 200
+
+
+def _shorten(value):
+    if isinstance(value, str):
+        if len(value) > _MAX_MESSAGE_STRING:
+            return value[:_MAX_MESSAGE_STRING - 3] + '...'
+        return value
+    return _message_repr.repr(value)
+
+
+class ConflictError(JsonPointerException):
+    """A pointer could not be locked because an overlapping one is locked"""
 
 
 class EndOfList:
@@ -145,8 +910,144 @@ class EndOfList:
                                      lst=repr(self.list_))
 
 
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions maxsize currsize')
+
+# a call reported by instrumentation: the operation ('resolve', 'set' or
+# 'delete'), the pointer, the duration in seconds, the number of steps that
+# were walked, the type names of the nodes they started from, and the
+# category of the failure or None, see enable_instrumentation()
+Event = namedtuple('Event', 'operation pointer duration steps node_types failure')
+
+# a column returned by extract_columns(): the values, and a mask that is true
+# where the pointer could not be resolved
+Column = namedtuple('Column', 'values missing')
+
+# why JsonPointer.lookup() failed: the index of the failing step, its part,
+# and the reason, one of 'missing-member', 'invalid-index', 'out-of-bounds'
+# and 'not-a-container'
+Miss = namedtuple('Miss', 'step part reason')
+
+
+class PointerCache:
+    """A size-bounded LRU cache of parsed pointers, keyed by pointer string
+
+    >>> cache = PointerCache(maxsize=2)
+    >>> cache.get('/a/b').parts
+    ('a', 'b')
+    >>> cache.get('/a/b') == JsonPointer('/a/b')
+    True
+    >>> _ = cache.get('/c'), cache.get('/d')
+    >>> cache.info()
+    CacheInfo(hits=1, misses=3, evictions=1, maxsize=2, currsize=2)
+    """
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pointers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pointer):
+        """Returns a JsonPointer for the pointer string, parsing it on a miss"""
+
+        with self._lock:
+            ptr = self._pointers.get(pointer)
+            if ptr is not None:
+                self._pointers.move_to_end(pointer)
+                self.hits += 1
+                return ptr
+
+        # parse outside of the lock; invalid pointers raise and are not cached
+        ptr = JsonPointer(pointer)
+
+        with self._lock:
+            self.misses += 1
+            self._pointers[pointer] = ptr
+            self._pointers.move_to_end(pointer)
+            while len(self._pointers) > self.maxsize:
+                self._pointers.popitem(last=False)
+                self.evictions += 1
+
+        return ptr
+
+    def clear(self):
+        """Removes all cached pointers and resets the statistics"""
+        with self._lock:
+            self._pointers.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        """Returns the cache statistics as a CacheInfo tuple"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self.maxsize, len(self._pointers))
+
+    def __len__(self):
+        return len(self._pointers)
+
+    def __contains__(self, pointer):
+        return pointer in self._pointers
+
+
+class PointerStats:
+    """An instrumentation sink that aggregates events across threads
+
+    calls, time and steps count the calls, seconds and steps per operation;
+    node_types and failures count the node types walked and the failure
+    categories of all calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.time = Counter()
+        self.steps = Counter()
+        self.node_types = Counter()
+        self.failures = Counter()
+
+    def __call__(self, event):
+        with self._lock:
+            self.calls[event.operation] += 1
+            self.time[event.operation] += event.duration
+            self.steps[event.operation] += event.steps
+            self.node_types.update(event.node_types)
+            if event.failure is not None:
+                self.failures[event.failure] += 1
+
+    def clear(self):
+        with self._lock:
+            for counter in (self.calls, self.time, self.steps, self.node_types, self.failures):
+                counter.clear()
+
+    def summary(self):
+        """Returns a copy of the statistics, with those of the pointer cache"""
+        with self._lock:
+            result = {
+                'calls': dict(self.calls),
+                'time': dict(self.time),
+                'steps': dict(self.steps),
+                'node_types': dict(self.node_types),
+                'failures': dict(self.failures),
+            }
+
+        cache = _pointer_cache
+        result['cache'] = None if cache is None else cache.info()._asdict()
+        return result
+
+
 class JsonPointer:
-    """A JSON Pointer that can reference parts of a JSON document"""
+    """A JSON Pointer that can reference parts of a JSON document
+
+    Pointers are immutable: their parts are stored as a tuple, and the hash
+    and escaped path are computed at most once per pointer.
+    """
+
+    __slots__ = ('_parts', '_path', '_hash')
 
     # Array indices must not contain:
     # leading zeros, signs, spaces, decimals, etc
@@ -155,59 +1056,192 @@ class JsonPointer:
 
     def __init__(self, pointer):
 
-        # validate escapes
-        invalid_escape = self._RE_INVALID_ESCAPE.search(pointer)
-        if invalid_escape:
-            raise JsonPointerException('Found invalid escape {}'.format(
-                invalid_escape.group()))
+        if '~' in pointer:
+            # validate escapes
+            invalid_escape = self._RE_INVALID_ESCAPE.search(pointer)
+            if invalid_escape:
+                raise JsonPointerException('Found invalid escape {}'.format(
+                    invalid_escape.group()))
+
+            parts = [unescape(part) for part in pointer.split('/')]
+        else:
+            # without escapes, the parts can be used as they are
+            parts = pointer.split('/')
 
-        parts = pointer.split('/')
-        if parts.pop(0) != '':
+        if parts[0] != '':
             raise JsonPointerException('Location must start with /')
 
-        parts = [unescape(part) for part in parts]
-        self.parts = parts
+        self._parts = tuple(parts[1:])
+        self._path = pointer
+        self._hash = None
+
+    @property
+    def parts(self):
+        """The unescaped parts of the pointer, as a tuple"""
+        return self._parts
 
     def to_last(self, doc):
         """Resolves ptr until the last step, returns (sub-doc, last-step)"""
 
-        if not self.parts:
+        parts = self._parts
+        if not parts:
             return doc, None
 
-        for part in self.parts[:-1]:
+        for part in parts[:-1]:
             doc = self.walk(doc, part)
 
-        return doc, JsonPointer.get_part(doc, self.parts[-1])
+        return doc, JsonPointer.get_part(doc, parts[-1])
 
     def resolve(self, doc, default=_nothing):
         """Resolves the pointer against doc and returns the referenced object"""
 
-        for part in self.parts:
+        if default is not _nothing:
+            return self.lookup(doc, default)[0]
+
+        for part in self._parts:
+            doc = self.walk(doc, part)
+
+        return doc
+
+    def lookup(self, doc, default=None):
+        """Resolves the pointer against doc without raising exceptions
+
+        Returns the referenced object and None, or default and a Miss that
+        tells at which step the pointer could not be resolved, and why.
+
+        >>> JsonPointer('/foo/3').lookup({'foo': [1, 2]})
+        (None, Miss(step=1, part='3', reason='out-of-bounds'))
+        """
+
+        # subclasses can change how steps are taken
+        fast = type(self).walk is JsonPointer.walk
+
+        for step, part in enumerate(self._parts):
+            doc_type = type(doc)
+            if fast and doc_type is dict:
+                if part in doc:
+                    doc = doc[part]
+                    continue
+                return default, Miss(step, part, 'missing-member')
+
+            if fast and doc_type is list:
+                if part == '-':
+                    doc = EndOfList(doc)
+                    continue
+                if not self._RE_ARRAY_INDEX.fullmatch(part):
+                    return default, Miss(step, part, 'invalid-index')
+                index = int(part)
+                if index >= len(doc):
+                    return default, Miss(step, part, 'out-of-bounds')
+                doc = doc[index]
+                continue
 
             try:
                 doc = self.walk(doc, part)
             except JsonPointerException:
-                if default is _nothing:
-                    raise
-                else:
-                    return default
+                return default, Miss(step, part, _failure_reason(doc, part))
 
-        return doc
+        return doc, None
 
     get = resolve
 
-    def set(self, doc, value, inplace=True):
-        """Resolve the pointer against the doc and replace the target with value."""
+    def compile(self):
+        """Returns a function that resolves the pointer against a document
+
+        The returned function takes a document and an optional default, like
+        resolve(). Array indices are parsed once up front, and steps into
+        plain dicts and lists are taken directly; every other step falls
+        back to walk(). If a subclass overrides walk(), all steps go
+        through it.
+
+        >>> get_prop = JsonPointer('/foo/0/prop').compile()
+        >>> get_prop({'foo': [{'prop': 44}]})
+        44
+        >>> get_prop({'foo': []}, None) is None
+        True
+        """
+
+        walk = self.walk
+        if type(self).walk is not JsonPointer.walk:
+            # subclasses can change how steps are taken, so there is no
+            # fast path for them
+            parts = self._parts
+
+            def resolve_walk(doc, default=_nothing):
+                try:
+                    for part in parts:
+                        doc = walk(doc, part)
+                except JsonPointerException:
+                    if default is _nothing:
+                        raise
+                    return default
+                return doc
+
+            return resolve_walk
+
+        steps = []
+        for part in self._parts:
+            if part != '-' and self._RE_ARRAY_INDEX.fullmatch(part):
+                steps.append((part, int(part)))
+            else:
+                steps.append((part, None))
+        steps = tuple(steps)
+
+        def resolve(doc, default=_nothing):
+            for part, index in steps:
+                doc_type = type(doc)
+                if doc_type is dict:
+                    if part in doc:
+                        doc = doc[part]
+                        continue
+                elif doc_type is list and index is not None:
+                    if index < len(doc):
+                        doc = doc[index]
+                        continue
+
+                # anything else takes the slow path, which also raises
+                # the proper errors
+                try:
+                    doc = walk(doc, part)
+                except JsonPointerException:
+                    if default is _nothing:
+                        raise
+                    return default
+
+            return doc
+
+        return resolve
+
+    def set(self, doc, value, inplace=True, share_structure=False):
+        """Resolve the pointer against the doc and replace the target with value.
+
+        With inplace set to false, doc is deep-copied before it is modified.
+        If share_structure is also set, only the containers on the path to
+        the target are (shallowly) copied; the returned document shares all
+        other subtrees with doc.
 
-        if len(self.parts) == 0:
+        >>> doc = {'foo': {'bar': [1, 2]}, 'baz': {'x': 1}}
+        >>> new = JsonPointer('/foo/bar/0').set(doc, 0, inplace=False, share_structure=True)
+        >>> new
+        {'foo': {'bar': [0, 2]}, 'baz': {'x': 1}}
+        >>> doc['foo']['bar']
+        [1, 2]
+        >>> new['baz'] is doc['baz']
+        True
+        """
+
+        if not self._parts:
             if inplace:
                 raise JsonPointerException('Cannot set root in place')
             return value
 
-        if not inplace:
+        if inplace:
+            (parent, part) = self.to_last(doc)
+        elif share_structure:
+            (doc, parent, part) = self._copy_path(doc)
+        else:
             doc = copy.deepcopy(doc)
-
-        (parent, part) = self.to_last(doc)
+            (parent, part) = self.to_last(doc)
 
         if isinstance(parent, Sequence) and part == '-':
             parent.append(value)
@@ -216,6 +1250,56 @@ class JsonPointer:
 
         return doc
 
+    def delete(self, doc, inplace=True, share_structure=False):
+        """Resolve the pointer against the doc and remove the target.
+
+        inplace and share_structure work as for set().
+
+        >>> doc = {'foo': ['a', 'b', 'c'], 'bar': 1}
+        >>> JsonPointer('/foo/1').delete(doc)
+        {'foo': ['a', 'c'], 'bar': 1}
+        >>> JsonPointer('/bar').delete(doc, inplace=False)
+        {'foo': ['a', 'c']}
+        """
+
+        if not self._parts:
+            raise JsonPointerException('Cannot delete root')
+
+        if inplace:
+            (parent, part) = self.to_last(doc)
+        elif share_structure:
+            (doc, parent, part) = self._copy_path(doc)
+        else:
+            doc = copy.deepcopy(doc)
+            (parent, part) = self.to_last(doc)
+
+        _delete_part(parent, part)
+        return doc
+
+    def _copy_path(self, doc):
+        """Shallow-copies all containers on the path to the target
+
+        Returns the copied document, the copied parent of the target and the
+        last step, like to_last().
+        """
+
+        parts = self._parts
+
+        # validate the whole path before copying anything
+        nodes = [doc]
+        keys = []
+        for part in parts[:-1]:
+            keys.append(JsonPointer.get_part(doc, part))
+            doc = self.walk(doc, part)
+            nodes.append(doc)
+        keys.append(JsonPointer.get_part(doc, parts[-1]))
+
+        copies = [copy.copy(node) for node in nodes]
+        for parent, key, child in zip(copies, keys, copies[1:]):
+            parent[key] = child
+
+        return copies[0], copies[-1], keys[-1]
+
     @classmethod
     def get_part(cls, doc, part):
         """Returns the next step in the correct type"""
@@ -229,7 +1313,7 @@ class JsonPointer:
                 return part
 
             if not JsonPointer._RE_ARRAY_INDEX.fullmatch(str(part)):
-                raise JsonPointerException("'%s' is not a valid sequence index" % part)
+                raise JsonPointerException._deferred("'%s' is not a valid sequence index", part)
 
             return int(part)
 
@@ -239,13 +1323,14 @@ class JsonPointer:
             return part
 
         else:
-            raise JsonPointerException("Document '%s' does not support indexing, "
-                                       "must be mapping/sequence or support __getitem__" % type(doc))
+            raise JsonPointerException._deferred("Document '%s' does not support indexing, "
+                                                 "must be mapping/sequence or support __getitem__",
+                                                 type(doc))
 
     def get_parts(self):
         """Returns the list of the parts. For example, JsonPointer('/a/b').get_parts() == ['a', 'b']"""
 
-        return self.parts
+        return list(self._parts)
 
     def walk(self, doc, part):
         """ Walks one step in doc and returns the referenced part """
@@ -262,18 +1347,18 @@ class JsonPointer:
                 return doc[part]
 
             except IndexError:
-                raise JsonPointerException("index '%s' is out of bounds" % (part,))
+                raise JsonPointerException._deferred("index '%s' is out of bounds", part)
 
         # Else the object is a mapping or supports __getitem__(so assume custom indexing)
         try:
             return doc[part]
 
         except KeyError:
-            raise JsonPointerException("member '%s' not found in %s" % (part, doc))
+            raise JsonPointerException._deferred("member '%s' not found in %s", part, doc)
 
     def contains(self, ptr):
         """ Returns True if self contains the given ptr """
-        return self.parts[:len(ptr.parts)] == ptr.parts
+        return self._parts[:len(ptr._parts)] == ptr._parts
 
     def __contains__(self, item):
         """ Returns True if self contains the given ptr """
@@ -281,16 +1366,73 @@ class JsonPointer:
 
     def join(self, suffix):
         """ Returns a new JsonPointer with the given suffix append to this ptr """
+        if isinstance(suffix, str):
+            suffix = _parse_pointer(suffix)
+
         if isinstance(suffix, JsonPointer):
-            suffix_parts = suffix.parts
-        elif isinstance(suffix, str):
-            suffix_parts = JsonPointer(suffix).parts
+            parts = suffix._parts
+            path = suffix._path
         else:
-            suffix_parts = suffix
-        try:
-            return JsonPointer.from_parts(chain(self.parts, suffix_parts))
-        except:  # noqa E722
-            raise JsonPointerException("Invalid suffix")
+            try:
+                parts = tuple([str(part) for part in suffix])
+            except TypeError:
+                raise JsonPointerException("Invalid suffix")
+            path = None
+
+        if path is not None and self._path is not None:
+            path = self._path + path
+        else:
+            path = None
+        return JsonPointer._from_parsed(self._parts + parts, path)
+
+    @property
+    def parent(self):
+        """The pointer to the container of the target
+
+        >>> JsonPointer('/foo/0/bar').parent
+        JsonPointer('/foo/0')
+        """
+        parts = self._parts
+        if not parts:
+            raise JsonPointerException('The root has no parent')
+
+        path = self._path
+        if path is not None:
+            # escaped parts do not contain '/'
+            path = path[:path.rindex('/')]
+        return JsonPointer._from_parsed(parts[:-1], path)
+
+    def common_prefix(self, other):
+        """Returns the longest pointer that contains both self and other
+
+        >>> JsonPointer('/foo/0/bar').common_prefix(JsonPointer('/foo/1'))
+        JsonPointer('/foo')
+        """
+        parts = self._parts
+        other_parts = other._parts
+
+        n = 0
+        for part, other_part in zip(parts, other_parts):
+            if part != other_part:
+                break
+            n += 1
+
+        if n == len(parts):
+            return self
+        if n == len(other_parts):
+            return other
+        return JsonPointer._from_parsed(parts[:n])
+
+    def relative_to(self, base):
+        """Returns the RelativeJsonPointer that leads from base to self
+
+        >>> JsonPointer('/foo/1/bar').relative_to(JsonPointer('/foo/0/baz'))
+        RelativeJsonPointer('2/1/bar')
+        """
+        parts = self._parts
+        n = len(self.common_prefix(base)._parts)
+        return RelativeJsonPointer._from_parsed(
+            len(base._parts) - n, None, JsonPointer._from_parsed(parts[n:]))
 
     def __truediv__(self, suffix):
         return self.join(suffix)
@@ -301,8 +1443,10 @@ class JsonPointer:
 
         >>> ptr = JsonPointer('/~0/0/~1').path == '/~0/0/~1'
         """
-        parts = [escape(part) for part in self.parts]
-        return ''.join('/' + part for part in parts)
+        path = self._path
+        if path is None:
+            path = self._path = ''.join('/' + escape(part) for part in self._parts)
+        return path
 
     def __eq__(self, other):
         """Compares a pointer to another object
@@ -315,10 +1459,16 @@ class JsonPointer:
         if not isinstance(other, JsonPointer):
             return False
 
-        return self.parts == other.parts
+        return self._parts == other._parts
 
     def __hash__(self):
-        return hash(tuple(self.parts))
+        h = self._hash
+        if h is None:
+            h = self._hash = hash(self._parts)
+        return h
+
+    def __reduce__(self):
+        return type(self), (self.path,)
 
     def __str__(self):
         return self.path
@@ -330,13 +1480,1822 @@ class JsonPointer:
     def from_parts(cls, parts):
         """Constructs a JsonPointer from a list of (unescaped) paths
 
+        The parts are converted to strings and used as they are; the
+        escaped path is only built when it is needed.
+
         >>> JsonPointer.from_parts(['a', '~', '/', 0]).path == '/a/~0/~1/0'
         True
         """
-        parts = [escape(str(part)) for part in parts]
-        ptr = cls(''.join('/' + part for part in parts))
+        if cls.__init__ is not JsonPointer.__init__:
+            # subclasses that parse differently get the escaped path
+            pointer = ''.join('/' + escape(str(part)) for part in parts)
+            return cls(pointer)
+
+        return cls._from_parsed(tuple([str(part) for part in parts]))
+
+    @classmethod
+    def _from_parsed(cls, parts, path=None):
+        """Constructs a JsonPointer from a tuple of unescaped parts
+
+        The parts are trusted as they are; path is computed on first use if
+        it is not given.
+        """
+        ptr = cls.__new__(cls)
+        ptr._parts = parts
+        ptr._path = path
+        ptr._hash = None
+        return ptr
+
+
+class RelativeJsonPointer:
+    """A Relative JSON Pointer (draft-bhutton-relative-json-pointer)
+
+    It is resolved against a location in a document, given as a JsonPointer:
+    it goes up levels steps from there, optionally moves the array index
+    reached by index_offset, and then either follows pointer or, for '#',
+    references the member name or array index of that location itself.
+
+    >>> doc = {'foo': ['bar', 'baz'], 'highly': {'nested': {'objects': True}}}
+    >>> location = JsonPointer('/foo/1')
+    >>> RelativeJsonPointer('0').resolve(doc, location)
+    'baz'
+    >>> RelativeJsonPointer('1/0').resolve(doc, location)
+    'bar'
+    >>> RelativeJsonPointer('0-1').resolve(doc, location)
+    'bar'
+    >>> RelativeJsonPointer('2/highly/nested/objects').resolve(doc, location)
+    True
+    >>> RelativeJsonPointer('0#').resolve(doc, location)
+    1
+    >>> RelativeJsonPointer('1#').resolve(doc, location)
+    'foo'
+    """
+
+    __slots__ = ('_levels', '_index_offset', '_pointer')
+
+    _RE_RELATIVE = re.compile('(0|[1-9][0-9]*)(?:([+-])(0|[1-9][0-9]*))?(#?)')
+
+    def __init__(self, pointer):
+        match = self._RE_RELATIVE.match(pointer)
+        if match is None:
+            raise JsonPointerException('Relative pointer must start with a number of levels')
+
+        levels, sign, offset, key = match.groups()
+        rest = pointer[match.end():]
+        if key and rest:
+            raise JsonPointerException("'#' must end a relative pointer")
+
+        self._levels = int(levels)
+        self._index_offset = None if sign is None else int(sign + offset)
+        self._pointer = None if key else _parse_pointer(rest)
+
+    @classmethod
+    def _from_parsed(cls, levels, index_offset, pointer):
+        ptr = cls.__new__(cls)
+        ptr._levels = levels
+        ptr._index_offset = index_offset
+        ptr._pointer = pointer
         return ptr
 
+    @property
+    def levels(self):
+        """The number of levels to go up from the location"""
+        return self._levels
+
+    @property
+    def index_offset(self):
+        """The offset to the array index after going up, or None"""
+        return self._index_offset
+
+    @property
+    def pointer(self):
+        """The JsonPointer to follow after going up, or None for '#'"""
+        return self._pointer
+
+    def _origin(self, location):
+        """Returns the parts of the location after going up and moving the index"""
+
+        parts = location._parts
+        if self._levels > len(parts):
+            raise JsonPointerException("cannot go up %d levels from '%s'" % (self._levels, location))
+        parts = parts[:len(parts) - self._levels]
+
+        if self._index_offset is not None:
+            last = parts[-1] if parts else None
+            if last is None or not JsonPointer._RE_ARRAY_INDEX.fullmatch(last):
+                raise JsonPointerException("'%s' is not an array index" % (last,))
+
+            index = int(last) + self._index_offset
+            if index < 0:
+                raise JsonPointerException("index '%d' is out of bounds" % (index,))
+            parts = parts[:-1] + (str(index),)
+
+        return parts
+
+    def to_absolute(self, location):
+        """Returns the JsonPointer that this pointer references from location
+
+        >>> RelativeJsonPointer('1+1/bar').to_absolute(JsonPointer('/foo/0/baz'))
+        JsonPointer('/foo/1/bar')
+        """
+        if self._pointer is None:
+            raise JsonPointerException("'%s' references a key, not a location" % (self,))
+        return JsonPointer._from_parsed(self._origin(location) + self._pointer._parts)
+
+    def resolve(self, doc, location, default=_nothing):
+        """Resolves the pointer against doc, starting at location"""
+
+        try:
+            if self._pointer is not None:
+                return self.to_absolute(location).resolve(doc)
+
+            parts = self._origin(location)
+            if not parts:
+                raise JsonPointerException('The root has no member name or index')
+
+            parent = JsonPointer._from_parsed(parts[:-1]).resolve(doc)
+            key = JsonPointer.get_part(parent, parts[-1])
+            # the location has to exist
+            JsonPointer.walk(location, parent, key)
+            return key
+        except JsonPointerException:
+            if default is _nothing:
+                raise
+            return default
+
+    def __eq__(self, other):
+        if not isinstance(other, RelativeJsonPointer):
+            return False
+        return (self._levels, self._index_offset, self._pointer) == \
+            (other._levels, other._index_offset, other._pointer)
+
+    def __hash__(self):
+        return hash((self._levels, self._index_offset, self._pointer))
+
+    def __reduce__(self):
+        return type(self), (str(self),)
+
+    def __str__(self):
+        result = str(self._levels)
+        if self._index_offset is not None:
+            result += '%+d' % self._index_offset
+        if self._pointer is None:
+            return result + '#'
+        return result + self._pointer.path
+
+    def __repr__(self):
+        return type(self).__name__ + "(" + repr(str(self)) + ")"
+
+
+class PointerSet(MutableSet):
+    """A set of pointers, stored as a trie of their parts
+
+    Besides the usual set operations, it answers prefix queries in time
+    proportional to the depth of the pointer, regardless of the number of
+    pointers in the set.
+
+    >>> allowed = PointerSet(['/public', '/users/0/name'])
+    >>> allowed.covers('/public/docs/1')
+    True
+    >>> allowed.longest_prefix('/users/0/name/first')
+    JsonPointer('/users/0/name')
+    >>> list(allowed.under('/users'))
+    [JsonPointer('/users/0/name')]
+    """
+
+    def __init__(self, pointers=()):
+        # nodes are [children by part, stored pointer or None]
+        self._root = [{}, None]
+        self._len = 0
+        for pointer in pointers:
+            self.add(pointer)
+
+    def _node(self, ptr):
+        """Returns the node of ptr, or None if there is none"""
+        node = self._root
+        for part in ptr._parts:
+            node = node[0].get(part)
+            if node is None:
+                return None
+        return node
+
+    def add(self, pointer):
+        ptr = _parse_pointer(pointer)
+        node = self._root
+        for part in ptr._parts:
+            child = node[0].get(part)
+            if child is None:
+                child = node[0][part] = [{}, None]
+            node = child
+
+        if node[1] is None:
+            self._len += 1
+        node[1] = ptr
+
+    def discard(self, pointer):
+        ptr = _parse_pointer(pointer)
+        nodes = [self._root]
+        for part in ptr._parts:
+            node = nodes[-1][0].get(part)
+            if node is None:
+                return
+            nodes.append(node)
+
+        if nodes[-1][1] is None:
+            return
+        nodes[-1][1] = None
+        self._len -= 1
+
+        # prune the nodes that no longer lead to any pointer
+        for part, parent, node in zip(reversed(ptr._parts), reversed(nodes[:-1]), reversed(nodes)):
+            if node[0] or node[1] is not None:
+                break
+            del parent[0][part]
+
+    def __contains__(self, pointer):
+        node = self._node(_parse_pointer(pointer))
+        return node is not None and node[1] is not None
+
+    def __iter__(self):
+        return self._iter_node(self._root)
+
+    def __len__(self):
+        return self._len
+
+    def __repr__(self):
+        return type(self).__name__ + "(" + repr([ptr.path for ptr in self]) + ")"
+
+    @staticmethod
+    def _iter_node(node):
+        # depth-first, with prefixes before the pointers below them
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node[1] is not None:
+                yield node[1]
+            stack.extend(reversed(node[0].values()))
+
+    def covers(self, pointer):
+        """Returns True if the set contains pointer or any prefix of it"""
+        return self.longest_prefix(pointer) is not None
+
+    def longest_prefix(self, pointer):
+        """Returns the longest pointer in the set that contains pointer, or None"""
+
+        node = self._root
+        longest = node[1]
+        for part in _parse_pointer(pointer)._parts:
+            node = node[0].get(part)
+            if node is None:
+                break
+            if node[1] is not None:
+                longest = node[1]
+        return longest
+
+    def under(self, prefix):
+        """Iterates over the pointers in the set that prefix contains"""
+
+        node = self._node(_parse_pointer(prefix))
+        if node is None:
+            return iter(())
+        return self._iter_node(node)
+
+    def clear(self):
+        self._root = [{}, None]
+        self._len = 0
+
+
+class PointerIndex:
+    """A document with an index of its nodes by pointer prefix
+
+    Nodes that are visited while resolving pointers are recorded by their
+    pointer prefix, so that repeated lookups, and lookups that share a
+    prefix with earlier ones, start from the deepest recorded node instead
+    of the root. At most maxsize nodes are recorded; the least recently used
+    ones are evicted first.
+
+    The index assumes that the document is only modified through set() and
+    delete(), or that invalidate() is called for modified subtrees.
+
+    >>> index = PointerIndex({'foo': {'bar': [1, 2]}})
+    >>> index.resolve('/foo/bar/1'), index.resolve('/foo/bar/1')
+    (2, 2)
+    >>> index.resolve('/foo/bar/0')  # walks from /foo/bar
+    1
+    >>> index.info()
+    CacheInfo(hits=1, misses=2, evictions=0, maxsize=10000, currsize=4)
+    >>> index.set('/foo/bar', [3])
+    >>> index.resolve('/foo/bar/0')
+    3
+    """
+
+    def __init__(self, doc, maxsize=10000):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.doc = doc
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._nodes = OrderedDict()
+        # the recorded keys as a trie like PointerSet's, whose nodes are
+        # [children by part, recorded key or None], so that invalidating a
+        # subtree only visits that subtree
+        self._trie = [{}, None]
+        self._lock = threading.Lock()
+
+    def resolve(self, pointer, default=_nothing):
+        """Resolves pointer against the document
+
+        A lookup counts as a hit if the target itself was recorded; otherwise
+        it walks from the deepest recorded prefix and records the nodes on
+        the way.
+        """
+
+        ptr = _parse_pointer(pointer)
+        parts = ptr._parts
+        nodes = self._nodes
+
+        with self._lock:
+            depth = len(parts)
+            node = _nothing
+            while depth:
+                key = parts[:depth]
+                node = nodes.get(key, _nothing)
+                if node is not _nothing:
+                    nodes.move_to_end(key)
+                    break
+                depth -= 1
+
+            if depth == 0:
+                node = self.doc
+
+            if depth == len(parts):
+                self.hits += 1
+                return node
+
+            self.misses += 1
+
+        visited = []
+        try:
+            for depth in range(depth, len(parts)):
+                node = ptr.walk(node, parts[depth])
+                if not isinstance(node, EndOfList):
+                    visited.append((parts[:depth + 1], node))
+        except JsonPointerException:
+            if default is _nothing:
+                raise
+            node = default
+        finally:
+            self._record(visited)
+
+        return node
+
+    get = resolve
+
+    def _record(self, visited):
+        if not visited:
+            return
+
+        nodes = self._nodes
+        with self._lock:
+            for key, node in visited:
+                if key in nodes:
+                    nodes.move_to_end(key)
+                else:
+                    self._trie_add(key)
+                nodes[key] = node
+
+            while len(nodes) > self.maxsize:
+                key, _ = nodes.popitem(last=False)
+                self._trie_discard(key)
+                self.evictions += 1
+
+    def _trie_path(self, key):
+        """Returns the trie nodes from the root to key, or None"""
+        path = [self._trie]
+        for part in key:
+            node = path[-1][0].get(part)
+            if node is None:
+                return None
+            path.append(node)
+        return path
+
+    def _trie_add(self, key):
+        node = self._trie
+        for part in key:
+            child = node[0].get(part)
+            if child is None:
+                child = node[0][part] = [{}, None]
+            node = child
+        node[1] = key
+
+    def _trie_discard(self, key):
+        path = self._trie_path(key)
+        path[-1][1] = None
+        self._trie_prune(key, path)
+
+    @staticmethod
+    def _trie_prune(key, path):
+        # removes the nodes that no longer lead to any recorded key
+        for part, parent, node in zip(reversed(key), reversed(path[:-1]), reversed(path)):
+            if node[0] or node[1] is not None:
+                break
+            del parent[0][part]
+
+    def invalidate(self, pointer):
+        """Forgets the recorded nodes of the subtree at pointer"""
+
+        parts = _parse_pointer(pointer)._parts
+
+        with self._lock:
+            if not parts:
+                self._nodes.clear()
+                self._trie = [{}, None]
+                return
+
+            path = self._trie_path(parts)
+            if path is None:
+                return
+
+            nodes = self._nodes
+            stack = [path[-1]]
+            while stack:
+                node = stack.pop()
+                if node[1] is not None:
+                    del nodes[node[1]]
+                stack.extend(node[0].values())
+
+            path[-1][0].clear()
+            path[-1][1] = None
+            self._trie_prune(parts, path)
+
+    def set(self, pointer, value):
+        """Sets the target of pointer in the document and updates the index"""
+
+        ptr = _parse_pointer(pointer)
+        if ptr._parts:
+            ptr.set(self.doc, value)
+        else:
+            self.doc = value
+
+        self.invalidate(ptr)
+
+    def delete(self, pointer):
+        """Removes the target of pointer from the document and updates the index"""
+
+        ptr = _parse_pointer(pointer)
+        parent = ptr.to_last(self.doc)[0]
+        ptr.delete(self.doc)
+
+        if isinstance(parent, Sequence):
+            # later items of the list have moved
+            self.invalidate(JsonPointer._from_parsed(ptr._parts[:-1]))
+        else:
+            self.invalidate(ptr)
+
+    def clear(self):
+        """Forgets all recorded nodes and resets the statistics"""
+        with self._lock:
+            self._nodes.clear()
+            self._trie = [{}, None]
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        """Returns the index statistics as a CacheInfo tuple"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self.maxsize, len(self._nodes))
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+class DocumentStore:
+    """A document that is shared between threads
+
+    Writes never modify the document in place: they copy the containers on
+    the path to the target and publish a new root (see share_structure in
+    JsonPointer.set()). Readers therefore never block; snapshot() returns
+    the current root, which stays unchanged for as long as it is used.
+
+    Writers lock the pointer they write to. Locks on pointers that contain
+    each other conflict, locks on disjoint subtrees do not, so writes to
+    different subtrees only contend for the short moment in which the new
+    root is published. Locks are reentrant for the thread that holds them.
+
+    Values passed in and returned are shared with the store and must not be
+    modified.
+
+    >>> store = DocumentStore({'users': {}, 'config': {'debug': False}})
+    >>> before = store.snapshot()
+    >>> store.set('/users/alice', {'admin': True})
+    >>> store.update('/config/debug', lambda debug: not debug)
+    True
+    >>> store.resolve('/users/alice/admin'), store.resolve('/config/debug')
+    (True, True)
+    >>> before
+    {'users': {}, 'config': {'debug': False}}
+    """
+
+    def __init__(self, doc):
+        self._root = doc
+        self._commit_lock = threading.Lock()
+
+        # locked pointers, their owning threads and lock counts
+        self._locked = PointerSet()
+        self._owners = {}
+        self._condition = threading.Condition(threading.Lock())
+
+    def snapshot(self):
+        """Returns the current document"""
+        return self._root
+
+    def resolve(self, pointer, default=_nothing):
+        """Resolves pointer against the current document"""
+        return _parse_pointer(pointer).resolve(self._root, default)
+
+    get = resolve
+
+    def _conflicts(self, ptr, thread):
+        locked = self._locked
+        if not locked:
+            return False
+
+        owners = self._owners
+        prefix = locked.longest_prefix(ptr)
+        if prefix is not None and owners[prefix][0] != thread:
+            return True
+        return any(owners[other][0] != thread for other in locked.under(ptr))
+
+    def acquire(self, pointer, blocking=True, timeout=None):
+        """Locks the subtree at pointer for the current thread
+
+        Raises a ConflictError if the lock cannot be taken without blocking,
+        or within timeout seconds.
+        """
+
+        ptr = _parse_pointer(pointer)
+        thread = threading.get_ident()
+
+        with self._condition:
+            if blocking:
+                acquired = self._condition.wait_for(
+                    lambda: not self._conflicts(ptr, thread), timeout)
+            else:
+                acquired = not self._conflicts(ptr, thread)
+
+            if not acquired:
+                raise ConflictError("'%s' overlaps with a locked pointer" % (ptr,))
+
+            count = self._owners.get(ptr, (thread, 0))[1]
+            self._owners[ptr] = (thread, count + 1)
+            self._locked.add(ptr)
+
+    def release(self, pointer):
+        """Releases a lock taken with acquire()"""
+
+        ptr = _parse_pointer(pointer)
+        with self._condition:
+            owner, count = self._owners.get(ptr, (None, 0))
+            if owner != threading.get_ident():
+                raise RuntimeError("'%s' is not locked by this thread" % (ptr,))
+
+            if count > 1:
+                self._owners[ptr] = (owner, count - 1)
+                return
+
+            del self._owners[ptr]
+            self._locked.discard(ptr)
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def lock(self, pointer, blocking=True, timeout=None):
+        """Holds the lock of pointer for a block of several reads and writes
+
+        >>> store = DocumentStore({'counters': {'a': 1}})
+        >>> with store.lock('/counters'):
+        ...     store.set('/counters/b', store.resolve('/counters/a') + 1)
+        >>> store.snapshot()
+        {'counters': {'a': 1, 'b': 2}}
+        """
+        self.acquire(pointer, blocking, timeout)
+        try:
+            yield self
+        finally:
+            self.release(pointer)
+
+    def _commit(self, write):
+        with self._commit_lock:
+            self._root = write(self._root)
+
+    def set(self, pointer, value):
+        """Sets the target of pointer to value"""
+
+        ptr = _parse_pointer(pointer)
+        self.acquire(ptr)
+        try:
+            self._commit(lambda root: ptr.set(root, value, inplace=False, share_structure=True))
+        finally:
+            self.release(ptr)
+
+    def delete(self, pointer):
+        """Removes the target of pointer"""
+
+        ptr = _parse_pointer(pointer)
+        # removing an item moves the following items of its list
+        locked = ptr.parent if ptr._parts else ptr
+        self.acquire(locked)
+        try:
+            self._commit(lambda root: ptr.delete(root, inplace=False, share_structure=True))
+        finally:
+            self.release(locked)
+
+    def update(self, pointer, func, default=_nothing):
+        """Replaces the target of pointer with func(target) and returns it
+
+        The target is locked while func runs; default is passed to func if
+        the target does not exist.
+        """
+
+        ptr = _parse_pointer(pointer)
+        self.acquire(ptr)
+        try:
+            value = func(ptr.resolve(self._root, default))
+            self._commit(lambda root: ptr.set(root, value, inplace=False, share_structure=True))
+        finally:
+            self.release(ptr)
+        return value
+
+
+class JsonPointerPattern:
+    """A JSON pointer that can match many nodes of a document
+
+    Patterns are written like JSON pointers, with some parts that have a
+    special meaning:
+
+    - ``*`` matches every member of an object or array,
+    - ``**`` matches the node itself and all its descendants (recursive
+      descent),
+    - ``start:stop:step`` (each of them optional, as in Python slices)
+      matches the selected elements of an array; on other nodes it is a
+      member name.
+
+    All other parts match like in a JSON pointer, so a pattern without
+    special parts matches exactly the node the pointer references.
+
+    The matches are produced lazily in document order, in a single walk over
+    the document that visits only the nodes on the way to a match.
+
+    >>> doc = {'items': [{'price': 1}, {'price': 2}, {'cost': 3}, {'price': 4}]}
+    >>> [(str(ptr), value) for ptr, value in JsonPointerPattern('/items/*/price').iter_matches(doc)]
+    [('/items/0/price', 1), ('/items/1/price', 2), ('/items/3/price', 4)]
+    >>> JsonPointerPattern('/items/1:/price').resolve(doc)
+    [2, 4]
+    >>> JsonPointerPattern('/**/cost').resolve(doc)
+    [3]
+    """
+
+    _RE_SLICE = re.compile('(-?[0-9]+)?:(-?[0-9]+)?(?::(-?[0-9]+)?)?$')
+
+    # kinds of steps
+    _MEMBER, _WILDCARD, _SLICE, _DESCENT = range(4)
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self._pointer = JsonPointer(pattern)
+        parts = self._pointer._parts
+
+        steps = []
+        for part in parts:
+            if part == '*':
+                steps.append((self._WILDCARD, None))
+            elif part == '**':
+                # consecutive recursive descents would match nodes repeatedly
+                if not steps or steps[-1][0] != self._DESCENT:
+                    steps.append((self._DESCENT, None))
+            else:
+                match = self._RE_SLICE.match(part)
+                if match:
+                    start, stop, step = (None if n is None else int(n)
+                                         for n in match.groups())
+                    if step == 0:
+                        raise JsonPointerException('Slice step cannot be zero')
+                    steps.append((self._SLICE, (part, slice(start, stop, step))))
+                else:
+                    steps.append((self._MEMBER, part))
+
+        self._steps = tuple(steps)
+
+    def iter_matches(self, doc):
+        """Yields (JsonPointer, value) for each node of doc that matches"""
+
+        steps = self._steps
+        end = len(steps)
+        walk = self._pointer.walk
+
+        # a stack of iterators over (node, parts, path, index of next step)
+        stack = [iter([(doc, (), '', 0)])]
+        while stack:
+            for node, parts, path, index in stack[-1]:
+                if index == end:
+                    yield JsonPointer._from_parsed(parts, path), node
+                    continue
+
+                kind, arg = steps[index]
+                if kind == self._MEMBER or (kind == self._SLICE and not _is_array(node)):
+                    part = arg if kind == self._MEMBER else arg[0]
+                    try:
+                        child = walk(node, part)
+                    except JsonPointerException:
+                        continue
+                    if isinstance(child, EndOfList):
+                        continue
+                    frames = iter([(child, parts + (part,), _child_path(path, part), index + 1)])
+
+                elif kind == self._SLICE:
+                    frames = self._children(node, range(len(node))[arg[1]], parts, path, index + 1)
+
+                else:
+                    members = _members(node)
+                    if members is None:
+                        if kind == self._WILDCARD:
+                            continue
+                        frames = iter([(node, parts, path, index + 1)])
+                    else:
+                        frames = self._children(node, members, parts, path,
+                                                index + 1 if kind == self._WILDCARD else index)
+                        if kind == self._DESCENT:
+                            # the node itself matches zero levels
+                            frames = chain([(node, parts, path, index + 1)], frames)
+
+                stack.append(frames)
+                break
+            else:
+                stack.pop()
+
+    @staticmethod
+    def _children(node, members, parts, path, index):
+        """Yields frames for the members (pairs or array indices) of node"""
+        for member in members:
+            if isinstance(member, tuple):
+                key, child = member
+            else:
+                key, child = member, node[member]
+            key = str(key)
+            yield child, parts + (key,), _child_path(path, key), index
+
+    def resolve(self, doc):
+        """Returns a list of the values of all matching nodes"""
+        return [value for _, value in self.iter_matches(doc)]
+
+    def __eq__(self, other):
+        if not isinstance(other, JsonPointerPattern):
+            return False
+        return self.pattern == other.pattern
+
+    def __hash__(self):
+        return hash(self.pattern)
+
+    def __str__(self):
+        return self.pattern
+
+    def __repr__(self):
+        return type(self).__name__ + "(" + repr(self.pattern) + ")"
+
+
+def _is_array(node):
+    return isinstance(node, Sequence) and not isinstance(node, (str, bytes, bytearray))
+
+
+def iter_matches(doc, pattern):
+    """Yields (JsonPointer, value) for each node of doc that matches pattern
+
+    >>> obj = {'foo': [{'bar': 1}, {'bar': 2}]}
+    >>> [value for _, value in iter_matches(obj, '/foo/*/bar')]
+    [1, 2]
+    """
+    if not isinstance(pattern, JsonPointerPattern):
+        pattern = JsonPointerPattern(pattern)
+    return pattern.iter_matches(doc)
+
+
+def _delete_part(parent, part):
+    """Removes the step part (as returned by get_part()) from parent"""
+
+    if isinstance(parent, Sequence):
+        if part == '-':
+            raise JsonPointerException("Cannot delete the end of a list")
+
+        try:
+            del parent[part]
+        except IndexError:
+            raise JsonPointerException._deferred("index '%s' is out of bounds", part)
+
+    else:
+        try:
+            del parent[part]
+        except KeyError:
+            raise JsonPointerException._deferred("member '%s' not found in %s", part, parent)
+
+
+# Scanning of JSON text, used to resolve pointers without decoding the
+# whole document. The scanner methods are generators that yield whenever the
+# buffered input is exhausted; whoever drives them sends the next chunk of
+# input (or an empty chunk at the end of the input).
+
+_QUOTE, _BACKSLASH, _COMMA, _COLON = b'"\\,:'
+_LBRACE, _RBRACE, _LBRACKET, _RBRACKET = b'{}[]'
+
+_RE_WS = re.compile(rb'[ \t\n\r]*')
+_RE_STRING_SPECIAL = re.compile(rb'["\\]')
+_RE_SKIP_CONTENT = re.compile(rb'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+_RE_SCALAR_END = re.compile(rb'[,:\]}\s]')
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _Scanner:
+    """Incremental scanner over JSON text
+
+    buf holds the input that has not been consumed yet (a bytearray when
+    streaming); offset is the absolute position of buf[0] in the input.
+    Input before self.mark (or self.pos, if no mark is set) is dropped when
+    more input arrives.
+    """
+
+    def __init__(self, buf=None, eof=False):
+        self.buf = bytearray() if buf is None else buf
+        self.pos = 0
+        self.offset = 0
+        self.eof = eof
+        self.mark = None
+
+        # whether scan() keeps the bytes of the targets, and how many
+        # pointers it has yet to find
+        self.capture = True
+        self.remaining = 0
+
+    def error(self, msg):
+        return ValueError('%s at offset %d' % (msg, self.offset + self.pos))
+
+    def more(self):
+        """Waits for more input; returns False at the end of the input"""
+
+        if self.eof:
+            return False
+
+        chunk = yield
+        if not chunk:
+            self.eof = True
+            return False
+
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+
+        # buf is a bytearray, which drops a prefix and appends in amortized
+        # constant time; copying it instead would make capturing a large
+        # target quadratic in its size
+        keep = self.pos if self.mark is None else self.mark
+        if keep:
+            del self.buf[:keep]
+            self.offset += keep
+            self.pos -= keep
+            if self.mark is not None:
+                self.mark -= keep
+
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Skips whitespace and returns the next byte, or None at the end"""
+
+        while True:
+            self.pos = _RE_WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+
+            if not (yield from self.more()):
+                return None
+
+    def expect(self, char):
+        if (yield from self.peek()) != char:
+            raise self.error('Expected %r' % chr(char))
+        self.pos += 1
+
+    def skip_string(self):
+        """Skips the string that starts at the current position"""
+
+        self.pos += 1
+        while True:
+            match = _RE_STRING_SPECIAL.search(self.buf, self.pos)
+            if match is None:
+                self.pos = len(self.buf)
+            else:
+                i = match.start()
+                if self.buf[i] == _QUOTE:
+                    self.pos = i + 1
+                    return
+
+                if i + 1 < len(self.buf):
+                    # skip the escaped character
+                    self.pos = i + 2
+                    continue
+
+                # the escaped character has not been read yet
+                self.pos = i
+
+            if not (yield from self.more()):
+                raise self.error('Unterminated string')
+
+    def read_string(self):
+        """Decodes the string that starts at the current position"""
+
+        if (yield from self.peek()) != _QUOTE:
+            raise self.error('Expected string')
+
+        self.mark = self.pos
+        yield from self.skip_string()
+        raw = bytes(self.buf[self.mark:self.pos])
+        self.mark = None
+
+        if b'\\' in raw:
+            return json.loads(raw)
+        return raw[1:-1].decode('utf-8')
+
+    def skip_value(self):
+        """Skips the value that starts at the current position"""
+
+        char = yield from self.peek()
+        if char is None:
+            raise self.error('Unexpected end of input')
+
+        if char == _QUOTE:
+            yield from self.skip_string()
+            return
+
+        if char == _LBRACE or char == _LBRACKET:
+            depth = 0
+            buf = self.buf
+            pos = self.pos
+            while True:
+                # skips everything up to the next bracket, including all
+                # strings that are already complete in the buffer
+                pos = _RE_SKIP_CONTENT.match(buf, pos).end()
+                if pos == len(buf):
+                    self.pos = pos
+                    if not (yield from self.more()):
+                        raise self.error('Unexpected end of input')
+                    buf, pos = self.buf, self.pos
+                    continue
+
+                char = buf[pos]
+                if char == _QUOTE:
+                    # a string that continues in the next chunk
+                    self.pos = pos
+                    yield from self.skip_string()
+                    buf, pos = self.buf, self.pos
+                    continue
+
+                pos += 1
+                if char == _LBRACE or char == _LBRACKET:
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        self.pos = pos
+                        return
+
+        start = self.offset + self.pos
+        while True:
+            match = _RE_SCALAR_END.search(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                break
+
+            self.pos = len(self.buf)
+            if not (yield from self.more()):
+                break
+
+        if self.offset + self.pos == start:
+            raise self.error('Expected value')
+
+    def members(self, visit):
+        """Consumes the object or array at the current position
+
+        visit(key) is called for each member, with the position at the
+        member's value; keys of arrays are their indices. It has to return a
+        generator that consumes the value. If that generator returns False,
+        the iteration stops early and False is returned.
+        """
+
+        char = yield from self.peek()
+        is_object = char == _LBRACE
+        close = _RBRACE if is_object else _RBRACKET
+        self.pos += 1
+
+        if (yield from self.peek()) == close:
+            self.pos += 1
+            return True
+
+        index = 0
+        while True:
+            if is_object:
+                key = yield from self.read_string()
+                yield from self.expect(_COLON)
+            else:
+                key = index
+                index += 1
+
+            if (yield from visit(key)) is False:
+                return False
+
+            char = yield from self.peek()
+            if char == close:
+                self.pos += 1
+                return True
+            if char != _COMMA:
+                raise self.error('Expected %r or %r' % (',', chr(close)))
+            self.pos += 1
+
+    def index(self, path, depth, spans):
+        """Records the spans of the value at the current position and its members
+
+        spans maps the escaped paths of all values down to depth levels
+        below path to their (start, end) offsets.
+        """
+
+        char = yield from self.peek()
+        start = self.offset + self.pos
+
+        if depth > 0 and (char == _LBRACE or char == _LBRACKET):
+            def visit(key):
+                return self.index(path + '/' + escape(str(key)), depth - 1, spans)
+
+            yield from self.members(visit)
+        else:
+            yield from self.skip_value()
+
+        spans[path] = (start, self.offset + self.pos)
+
+    def scan(self, node, depth, found):
+        """Finds the pointers of a trie node in the value at the current position
+
+        found maps the index of each pointer to (depth, start, end, data):
+        the value spanning start to end (absolute offsets, data holds its
+        bytes unless capturing is disabled) is the target of the first depth
+        parts of the pointer. Returns False once all pointers are found.
+        """
+
+        char = yield from self.peek()
+        if char is None:
+            raise self.error('Unexpected end of input')
+
+        if node[1]:
+            # pointers end here; pointers below are resolved from the capture
+            self.mark = self.pos
+            start = self.offset + self.pos
+            yield from self.skip_value()
+            data = bytes(self.buf[self.mark:self.pos]) if self.capture else None
+            self.mark = None
+
+            capture = (depth, start, self.offset + self.pos, data)
+            nodes = [node]
+            while nodes:
+                sub = nodes.pop()
+                for index in sub[1]:
+                    if index not in found:
+                        self.remaining -= 1
+                    found[index] = capture
+                nodes.extend(sub[0].values())
+
+            return self.remaining > 0
+
+        if char == _LBRACE:
+            children = node[0]
+        elif char == _LBRACKET:
+            children = {int(part): child for part, child in node[0].items()
+                        if part != '-' and JsonPointer._RE_ARRAY_INDEX.fullmatch(part)}
+        else:
+            children = None
+
+        if children is not None:
+            def visit(key):
+                child = children.get(key)
+                if child is None:
+                    return self.skip_value()
+                return self.scan(child, depth + 1, found)
+
+            return (yield from self.members(visit))
+
+        # a scalar, which has no children
+        yield from self.skip_value()
+        return True
+
+
+def _feed(gen, read, chunk_size=STREAM_CHUNK_SIZE):
+    """Drives a scanner generator with chunks from read(); returns its result"""
+
+    try:
+        next(gen)
+        while True:
+            gen.send(read(chunk_size))
+    except StopIteration as ex:
+        return ex.value
+
+
+def _scan_pointers(scanner, pointers):
+    """Returns a generator that scans for the pointers, see _Scanner.scan()"""
+
+    found = {}
+    scanner.remaining = len(pointers)
+
+    def scan():
+        if pointers:
+            yield from scanner.scan(_build_trie(pointers), 0, found)
+        return found
+
+    return scan()
+
+
+def _decode_found(pointers, found, default):
+    """Decodes the targets found by _Scanner.scan() in the order of pointers"""
+
+    results = []
+    decoded = {}
+    for index, ptr in enumerate(pointers):
+        if index not in found:
+            if default is _nothing:
+                raise JsonPointerException("'%s' not found in the JSON input" % (ptr,))
+            results.append(default)
+            continue
+
+        depth, start, end, data = found[index]
+        if start not in decoded:
+            decoded[start] = json.loads(data)
+
+        value = decoded[start]
+        if depth < len(ptr._parts):
+            value = JsonPointer._from_parsed(ptr._parts[depth:]).resolve(value, default)
+        results.append(value)
+
+    return results
+
+
+def resolve_stream(fp, pointer, default=_nothing, chunk_size=STREAM_CHUNK_SIZE):
+    """Resolves pointer against the JSON document read from the file fp
+
+    The document is scanned incrementally: subtrees that are not on the way
+    to the target are skipped without being decoded, and reading stops as
+    soon as the target has been read completely. Only the target is kept in
+    memory. fp may be opened in binary (preferred) or text mode.
+
+    >>> import io
+    >>> fp = io.BytesIO(b'{"meta": {"version": 3}, "data": [1, 2, 3]}')
+    >>> resolve_stream(fp, '/meta/version', chunk_size=8)
+    3
+    >>> fp.read()  # the rest of the input has not been read
+    b' "data": [1, 2, 3]}'
+    """
+
+    return resolve_stream_many(fp, [pointer], default, chunk_size)[0]
+
+
+def resolve_stream_many(fp, pointers, default=_nothing, chunk_size=STREAM_CHUNK_SIZE):
+    """Resolves several pointers in one pass over the JSON document in fp
+
+    Like resolve_stream(), but returns a list of targets in the order of
+    pointers. Targets that cannot be found yield default, or raise a
+    JsonPointerException if no default is given.
+    """
+
+    pointers = [_parse_pointer(p) for p in pointers]
+    found = _feed(_scan_pointers(_Scanner(), pointers), fp.read, chunk_size)
+    return _decode_found(pointers, found, default)
+
+
+async def _afeed(gen, source, chunk_size=STREAM_CHUNK_SIZE):
+    """Like _feed(), with chunks from an asynchronous source
+
+    source is either an object with a coroutine method read(n), such as
+    asyncio.StreamReader, or an asynchronous iterable of chunks. Iterators
+    are closed with aclose() once the scanner is done with them.
+    """
+
+    import asyncio
+
+    chunks = None
+    read = getattr(source, 'read', None)
+    if read is None:
+        chunks = aiter(source)
+
+        async def read(size):
+            return await anext(chunks, b'')
+
+    try:
+        next(gen)
+        while True:
+            chunk = await read(chunk_size)
+            gen.send(chunk)
+            if chunk:
+                # readers that have data buffered return without suspending;
+                # give other tasks a turn between chunks
+                await asyncio.sleep(0)
+    except StopIteration as ex:
+        return ex.value
+    finally:
+        aclose = getattr(chunks, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+
+async def aresolve_stream(stream, pointer, default=_nothing, chunk_size=STREAM_CHUNK_SIZE):
+    """Resolves pointer against the JSON document read from an asynchronous stream
+
+    The asynchronous counterpart of resolve_stream(). stream is either an
+    object with a coroutine method read(n), such as asyncio.StreamReader, or
+    an asynchronous iterable of chunks (bytes or str). Reading stops as soon
+    as the target has been read completely; iterables are closed then.
+
+    >>> import asyncio
+    >>> async def chunks():
+    ...     yield b'{"meta": {"version": 3}, '
+    ...     yield b'"data": [1, 2, 3]}'
+    >>> asyncio.run(aresolve_stream(chunks(), '/meta/version'))
+    3
+    """
+
+    return (await aresolve_stream_many(stream, [pointer], default, chunk_size))[0]
+
+
+async def aresolve_stream_many(stream, pointers, default=_nothing, chunk_size=STREAM_CHUNK_SIZE):
+    """Resolves several pointers in one pass over an asynchronous stream
+
+    Like aresolve_stream(), but returns a list of targets in the order of
+    pointers, see resolve_stream_many().
+    """
+
+    pointers = [_parse_pointer(p) for p in pointers]
+    found = await _afeed(_scan_pointers(_Scanner(), pointers), stream, chunk_size)
+    return _decode_found(pointers, found, default)
+
+
+def resolve_raw(buf, pointer, default=_nothing):
+    """Returns the JSON text of the target of pointer in buf, without decoding it
+
+    buf holds a JSON document encoded in UTF-8; it can be anything that
+    supports the buffer protocol, such as bytes, memoryview or mmap. The
+    result is a memoryview of buf that spans the text of the target. No
+    Python objects are built for the document, apart from the member names
+    on the way to the target, and nothing is copied.
+
+    The view keeps buf exported; release() it before resizing or closing buf.
+
+    >>> buf = b'{"meta": {"version": 3}, "data": [1, {"a": "b"}]}'
+    >>> bytes(resolve_raw(buf, '/data/1'))
+    b'{"a": "b"}'
+    """
+
+    pointer = _parse_pointer(pointer)
+    view = memoryview(buf)
+
+    scanner = _Scanner(view, eof=True)
+    scanner.capture = False
+    found = _feed(_scan_pointers(scanner, [pointer]), None)
+
+    if 0 not in found:
+        if default is _nothing:
+            raise JsonPointerException("'%s' not found in the JSON input" % (pointer,))
+        return default
+
+    _, start, end, _ = found[0]
+    return view[start:end]
+
+
+class _SpanTable(Mapping):
+    """A read-only mapping of escaped paths to spans, stored in a buffer
+
+    The buffer holds a table of count records of four native unsigned
+    64-bit integers (key start, key end, span start, span end), sorted by
+    key, followed by the UTF-8 encoded keys. Lookups are binary searches,
+    so nothing has to be decoded up front.
+    """
+
+    def __init__(self, buf, offset, count):
+        table_size = count * 4 * 8
+        self._table = memoryview(buf)[offset:offset + table_size].cast('Q')
+        self._buf = buf
+        self._keys = offset + table_size
+        self._count = count
+
+    @staticmethod
+    def dump(spans):
+        """Returns the table and keys for spans, as bytes"""
+
+        table = array('Q')
+        keys = bytearray()
+        for key, (start, end) in sorted((key.encode('utf-8'), span)
+                                        for key, span in spans.items()):
+            table.extend((len(keys), len(keys) + len(key), start, end))
+            keys += key
+        return table.tobytes() + keys
+
+    def _key(self, i):
+        table, keys = self._table, self._keys
+        return self._buf[keys + table[4 * i]:keys + table[4 * i + 1]]
+
+    def __getitem__(self, path):
+        key = path.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < self._count and self._key(lo) == key:
+            return (self._table[4 * lo + 2], self._table[4 * lo + 3])
+        raise KeyError(path)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._key(i).decode('utf-8')
+
+    def __len__(self):
+        return self._count
+
+    def release(self):
+        self._table.release()
+
+
+class JsonFileIndex:
+    """An index of the byte offsets of the values in a JSON file
+
+    The index is built in one pass over the file and records where each
+    value down to depth levels below the root starts and ends. It is
+    persisted in a sidecar file (path + '.jpidx' by default), along with the
+    size and modification time of the JSON file, so that later processes can
+    reuse it as long as the file has not changed. The sidecar is
+    memory-mapped and searched in place, so loading it does not depend on
+    its size.
+
+    To resolve a pointer, the file is memory-mapped and only the span of the
+    longest indexed prefix of the pointer is scanned and decoded. Pointers
+    that leave the document within the indexed levels are reported as
+    missing without reading the file.
+
+    >>> import os, tempfile
+    >>> with tempfile.TemporaryDirectory() as tmp:
+    ...     path = os.path.join(tmp, 'doc.json')
+    ...     with open(path, 'w') as f:
+    ...         _ = f.write('{"meta": {"version": 3}, "data": [{"a": 1}, {"a": 2}]}')
+    ...     with JsonFileIndex.open(path, depth=2) as index:
+    ...         index.resolve('/data/1/a'), index.spans['/meta/version']
+    (2, (21, 22))
+    """
+
+    SUFFIX = '.jpidx'
+    FORMAT_VERSION = 2
+
+    # the sidecar starts with MAGIC and a JSON header on one line
+    MAGIC = b'JPIDX '
+
+    def __init__(self, path, depth=2, index_path=None):
+        self.path = path
+        self.depth = depth
+        self.index_path = index_path or path + self.SUFFIX
+        self.spans = None
+        self._stat = None
+        self._file = None
+        self._mmap = None
+        self._index_mmap = None
+
+    @classmethod
+    def open(cls, path, depth=2, index_path=None):
+        """Loads the sidecar index of path, (re)building it if necessary"""
+
+        index = cls(path, depth, index_path)
+        try:
+            if not index.load():
+                index.build()
+                index.save()
+        except BaseException:
+            index.close()
+            raise
+        return index
+
+    def _file_stat(self):
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def build(self):
+        """Builds the index in one pass over the file"""
+
+        self._stat = self._file_stat()
+        spans = {}
+        scanner = _Scanner(self._buffer(), eof=True)
+        _feed(scanner.index('', self.depth, spans), None)
+        self.spans = spans
+
+    def _header(self):
+        return {
+            'version': self.FORMAT_VERSION,
+            'depth': self.depth,
+            'stat': self._stat,
+            'byteorder': sys.byteorder,
+            'count': len(self.spans),
+        }
+
+    def load(self):
+        """Loads the sidecar index; returns False if it is missing or stale"""
+
+        try:
+            with open(self.index_path, 'rb') as f:
+                line = f.readline(4096)
+                if not line.startswith(self.MAGIC) or not line.endswith(b'\n'):
+                    return False
+                header = json.loads(line[len(self.MAGIC):])
+
+                stat = self._file_stat()
+                if header.get('version') != self.FORMAT_VERSION or \
+                        header.get('depth') != self.depth or \
+                        header.get('stat') != stat or \
+                        header.get('byteorder') != sys.byteorder:
+                    return False
+
+                count = header['count']
+                if os.fstat(f.fileno()).st_size < len(line) + count * 4 * 8:
+                    return False
+
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        self._stat = stat
+        self._index_mmap = buf
+        self.spans = _SpanTable(buf, len(line), count)
+        return True
+
+    def save(self):
+        """Writes the index to its sidecar file"""
+
+        header = json.dumps(self._header(), separators=(',', ':'))
+        data = _SpanTable.dump(self.spans)
+
+        # processes that use the old sidecar keep it mapped, so it is
+        # replaced rather than overwritten
+        tmp_path = '%s.%d.tmp' % (self.index_path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self.MAGIC + header.encode('utf-8') + b'\n')
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _buffer(self):
+        if self._mmap is None:
+            self._file = open(self.path, 'rb')
+            try:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be mapped
+                self._mmap = b''
+        return self._mmap
+
+    def _locate(self, pointer):
+        """Returns the span of the longest indexed prefix of pointer and its depth
+
+        All values down to self.depth levels are indexed, so a part that is
+        missing from the index within these levels does not exist; the depth
+        is None then.
+        """
+
+        spans = self.spans
+        if spans is None:
+            raise JsonPointerException('Index has not been built or loaded')
+
+        path = ''
+        span = spans.get(path)
+        if span is None:
+            raise ValueError('%s does not contain a JSON document' % (self.path,))
+
+        depth = 0
+        for part in pointer._parts[:self.depth]:
+            path = path + '/' + escape(part)
+            sub = spans.get(path)
+            if sub is None:
+                return span, None
+            span = sub
+            depth += 1
+
+        return span, depth
+
+    def resolve(self, pointer, default=_nothing):
+        """Resolves pointer against the indexed file"""
+
+        pointer = _parse_pointer(pointer)
+        (start, end), depth = self._locate(pointer)
+
+        missing = object()
+        value = missing
+        if depth is not None:
+            # the view is released before returning or raising, so that the
+            # file can be unmapped on close()
+            with memoryview(self._buffer())[start:end] as data:
+                if depth == len(pointer._parts):
+                    return json.loads(bytes(data))
+
+                suffix = [JsonPointer._from_parsed(pointer._parts[depth:])]
+                found = _feed(_scan_pointers(_Scanner(data, eof=True), suffix), None)
+                value = _decode_found(suffix, found, missing)[0]
+
+        # like the streaming resolvers, the end of an array counts as missing
+        if value is missing or isinstance(value, EndOfList):
+            if default is _nothing:
+                raise JsonPointerException("'%s' not found in the JSON input" % (pointer,))
+            return default
+        return value
+
+    def close(self):
+        if self._mmap is not None:
+            if isinstance(self._mmap, mmap.mmap):
+                self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+        if self._index_mmap is not None:
+            self.spans.release()
+            self._index_mmap.close()
+            self._index_mmap = self.spans = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Server mode: documents are kept in memory by a server process, which
+# answers requests on a Unix domain socket. Requests and responses are JSON
+# objects, one per line:
+#
+#   {"op": "resolve", "pointer": "/a/b", "doc": "/path/to/doc.json"}
+#   {"op": "batch", "pointers": ["/a", "/b"], "default": null}
+#   {"op": "set", "pointer": "/a/b", "value": 1}
+#
+# doc is optional and defaults to the first document; default is optional as
+# well. A line that is not a JSON object is resolved as a pointer against
+# the first document. Responses are {"value": ...} or {"error": "..."}.
+
+def _file_version(path):
+    """Returns the size and modification time of a file, or None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _load_json(path):
+    with open(path, 'rb') as f:
+        return json.load(f)
+
+
+class _ServedDocument:
+
+    def __init__(self, path):
+        self.path = path
+        self.version = _file_version(path)
+        self.doc = _load_json(path)
+
+
+class JsonPointerServer:
+    """Serves JSON documents on a Unix domain socket
+
+    The documents are loaded once and kept in memory; a document is
+    reloaded when the size or modification time of its file changes, which
+    is checked every poll_interval seconds. Changes made with "set"
+    requests only affect the document in memory. Compiled pointers are
+    cached, up to cache_size of them.
+
+    Documents are named by the absolute paths of their files.
+    """
+
+    # maximum length of a request line
+    LIMIT = 64 * 1024 * 1024
+
+    def __init__(self, paths, poll_interval=1.0, cache_size=4096):
+        self.documents = OrderedDict()
+        for path in paths:
+            path = os.path.abspath(path)
+            self.documents[path] = _ServedDocument(path)
+
+        if not self.documents:
+            raise ValueError('No documents to serve')
+
+        self.poll_interval = poll_interval
+        self._compile = functools.lru_cache(cache_size)(self._compile_pointer)
+
+    @staticmethod
+    def _compile_pointer(pointer):
+        return _parse_pointer(pointer).compile()
+
+    def _document(self, name):
+        if name is None:
+            return next(iter(self.documents.values()))
+
+        document = self.documents.get(os.path.abspath(name))
+        if document is None:
+            raise ValueError("Document '%s' is not served" % (name,))
+        return document
+
+    def _execute(self, request):
+        op = request.get('op', 'resolve')
+        document = self._document(request.get('doc'))
+        default = request.get('default', _nothing)
+
+        if op == 'resolve':
+            return self._compile(request['pointer'])(document.doc, default)
+
+        if op == 'batch':
+            return [self._compile(pointer)(document.doc, default)
+                    for pointer in request['pointers']]
+
+        if op == 'set':
+            ptr = _parse_pointer(request['pointer'])
+            document.doc = ptr.set(document.doc, request['value'], inplace=bool(ptr._parts))
+            return None
+
+        raise ValueError("Unknown operation '%s'" % (op,))
+
+    def handle_request(self, line):
+        """Answers one request line; returns the response line"""
+
+        try:
+            text = line.decode('utf-8').strip()
+            if text.startswith('{'):
+                request = json.loads(text)
+            else:
+                request = {'op': 'resolve', 'pointer': text}
+
+            response = json.dumps({'value': self._execute(request)})
+        except KeyError as ex:
+            response = json.dumps({'error': 'Missing field %s' % (ex,)})
+        except Exception as ex:
+            # every failed request is answered, e.g. the IndexError of a set
+            # beyond the end of an array, so the connection stays usable
+            response = json.dumps({'error': str(ex)})
+
+        return response.encode('utf-8') + b'\n'
+
+    async def _handle_connection(self, reader, writer):
+        import asyncio
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # the request is longer than LIMIT
+                    break
+
+                if not line:
+                    break
+
+                writer.write(self.handle_request(line))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # connections are cancelled when the server shuts down, which
+            # is not an error of the connection
+            pass
+        finally:
+            writer.close()
+
+    def reload(self):
+        """Reloads the documents whose files have changed; returns their names"""
+
+        reloaded = []
+        for path, document in self.documents.items():
+            version = _file_version(path)
+            if version is None or version == document.version:
+                continue
+
+            # remember the version even if it cannot be loaded, so that the
+            # file is only read again once it changes
+            document.version = version
+            try:
+                document.doc = _load_json(path)
+            except (OSError, ValueError):
+                continue
+            reloaded.append(path)
+
+        return reloaded
+
+    async def _watch(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            # files are read and parsed outside of the event loop
+            await loop.run_in_executor(None, self.reload)
+
+    async def start(self, socket_path):
+        """Starts serving on socket_path and watching the files
+
+        Returns the asyncio server; close() stops both.
+        """
+
+        import asyncio
+
+        self._server = await asyncio.start_unix_server(
+            self._handle_connection, socket_path, limit=self.LIMIT)
+        self._watcher = asyncio.ensure_future(self._watch())
+        return self._server
+
+    def close(self):
+        self._watcher.cancel()
+        self._server.close()
+
+    async def serve_forever(self, socket_path):
+        server = await self.start(socket_path)
+        try:
+            await server.serve_forever()
+        finally:
+            self.close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+
+class JsonPointerClient:
+    """A blocking client of JsonPointerServer
+
+    >>> with JsonPointerClient('/tmp/jsonpointer.sock') as client:  # doctest: +SKIP
+    ...     client.resolve('/foo/bar')
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        import socket
+
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.settimeout(timeout)
+            self._socket.connect(socket_path)
+        except BaseException:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile('rwb')
+
+    def request(self, request):
+        """Sends a request and returns the value of the response
+
+        Errors reported by the server are raised as JsonPointerException.
+        """
+
+        self._file.write(json.dumps(request).encode('utf-8') + b'\n')
+        self._file.flush()
+
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('The server closed the connection')
+
+        response = json.loads(line)
+        if 'error' in response:
+            raise JsonPointerException(response['error'])
+        return response['value']
+
+    def _request(self, op, doc, default, **fields):
+        request = dict(fields, op=op)
+        if doc is not None:
+            request['doc'] = os.path.abspath(doc)
+        if default is not _nothing:
+            request['default'] = default
+        return self.request(request)
+
+    def resolve(self, pointer, doc=None, default=_nothing):
+        return self._request('resolve', doc, default, pointer=str(pointer))
+
+    def resolve_many(self, pointers, doc=None, default=_nothing):
+        return self._request('batch', doc, default, pointers=[str(p) for p in pointers])
+
+    def set(self, pointer, value, doc=None):
+        self._request('set', doc, _nothing, pointer=str(pointer), value=value)
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 
 def escape(s):
     return s.replace('~', '~0').replace('/', '~1')
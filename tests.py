@@ -1,12 +1,28 @@
 #!/usr/bin/env python
 
+import asyncio
+import collections
 import copy
 import doctest
+import io
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
 import unittest
+from array import array
 
 import jsonpointer
 from jsonpointer import resolve_pointer, EndOfList, JsonPointerException, \
-    JsonPointer, set_pointer
+    JsonPointer, set_pointer, resolve_many, delete_pointer, apply_many, \
+    delete_many
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class SpecificationTests(unittest.TestCase):
@@ -68,7 +84,7 @@ class SpecificationTests(unittest.TestCase):
             self.assertEqual(path, ptr.path)
 
             parts = ptr.get_parts()
-            self.assertEqual(parts, ptr.parts)
+            self.assertEqual(tuple(parts), ptr.parts)
             new_ptr = JsonPointer.from_parts(parts)
             self.assertEqual(ptr, new_ptr)
 
@@ -125,6 +141,53 @@ class SpecificationTests(unittest.TestCase):
             self.assertEqual(ptr.get_parts(), path[1])
 
 
+class ImmutabilityTests(unittest.TestCase):
+
+    def test_parts_tuple(self):
+        ptr = JsonPointer('/a/0')
+        self.assertEqual(ptr.parts, ('a', '0'))
+        self.assertEqual(ptr.get_parts(), ['a', '0'])
+
+        # get_parts() returns a copy that can be modified freely
+        ptr.get_parts().append('b')
+        self.assertEqual(ptr.parts, ('a', '0'))
+
+    def test_frozen(self):
+        ptr = JsonPointer('/a')
+        self.assertRaises(AttributeError, setattr, ptr, 'parts', ['b'])
+        self.assertRaises(AttributeError, setattr, ptr, 'foo', 1)
+
+    def test_hash_is_stable(self):
+        ptr = JsonPointer('/a/b')
+        self.assertEqual(hash(ptr), hash(('a', 'b')))
+        self.assertEqual(hash(ptr), hash(JsonPointer.from_parts(['a', 'b'])))
+        self.assertEqual(len({ptr, JsonPointer('/a/b'), JsonPointer('/a')}), 2)
+
+    def test_from_parts(self):
+        ptr = JsonPointer.from_parts(['a/b', '~', 1])
+        self.assertEqual(ptr.parts, ('a/b', '~', '1'))
+        self.assertEqual(ptr.path, '/a~1b/~0/1')
+        self.assertEqual(ptr, JsonPointer('/a~1b/~0/1'))
+
+    def test_from_parts_subclass(self):
+        class LowerPointer(JsonPointer):
+            __slots__ = ()
+
+            def __init__(self, pointer):
+                super().__init__(pointer.lower())
+
+        ptr = LowerPointer.from_parts(['A', 'b/C'])
+        self.assertIsInstance(ptr, LowerPointer)
+        self.assertEqual(ptr.parts, ('a', 'b/c'))
+
+    def test_copy_and_pickle(self):
+        ptr = JsonPointer('/a~1b/~0')
+        self.assertEqual(copy.copy(ptr), ptr)
+        self.assertEqual(copy.deepcopy(ptr), ptr)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(ptr, protocol)), ptr)
+
+
 class ComparisonTests(unittest.TestCase):
 
     def setUp(self):
@@ -215,11 +278,208 @@ class WrongInputTests(unittest.TestCase):
     def test_invalid_escape(self):
         self.assertRaises(JsonPointerException, JsonPointer, '/foo/bar~2')
 
+    def test_no_leading_slash(self):
+        self.assertRaises(JsonPointerException, JsonPointer, 'foo/bar')
+        self.assertRaises(JsonPointerException, JsonPointer, 'foo/~1')
+
     def test_leading_zero(self):
         doc = [0, 1, 2]
         self.assertRaises(JsonPointerException, resolve_pointer, doc, '/01')
 
 
+class LookupTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {'a': [1, {'b': 2}], 'c': 3}
+
+    def test_found(self):
+        self.assertEqual(JsonPointer('/a/1/b').lookup(self.doc), (2, None))
+        self.assertEqual(JsonPointer('').lookup(self.doc), (self.doc, None))
+        value, miss = JsonPointer('/a/-').lookup(self.doc)
+        self.assertIsInstance(value, EndOfList)
+        self.assertIsNone(miss)
+
+    def test_misses(self):
+        Miss = jsonpointer.Miss
+        cases = [
+            ('/x', Miss(0, 'x', 'missing-member')),
+            ('/a/x', Miss(1, 'x', 'invalid-index')),
+            ('/a/01', Miss(1, '01', 'invalid-index')),
+            ('/a/5', Miss(1, '5', 'out-of-bounds')),
+            ('/c/x', Miss(1, 'x', 'not-a-container')),
+            ('/a/-/x', Miss(2, 'x', 'not-a-container')),
+            ('/a/1/b/c', Miss(3, 'c', 'not-a-container')),
+        ]
+        for path, miss in cases:
+            self.assertEqual(jsonpointer.lookup_pointer(self.doc, path), (None, miss))
+            self.assertEqual(JsonPointer(path).lookup(self.doc, 'd'), ('d', miss))
+            self.assertEqual(resolve_pointer(self.doc, path, 'd'), 'd')
+            self.assertRaises(JsonPointerException, resolve_pointer, self.doc, path)
+
+    def test_other_types(self):
+        doc = collections.OrderedDict(a=(1, 2))
+        self.assertEqual(JsonPointer('/a/1').lookup(doc), (2, None))
+        self.assertEqual(JsonPointer('/a/2').lookup(doc)[1].reason, 'out-of-bounds')
+        self.assertEqual(JsonPointer('/b').lookup(doc)[1].reason, 'missing-member')
+
+    def test_subclass_walk(self):
+        class DefaultPointer(JsonPointer):
+            __slots__ = ()
+
+            def walk(self, doc, part):
+                if isinstance(doc, dict) and part not in doc:
+                    return 0
+                return super().walk(doc, part)
+
+        self.assertEqual(DefaultPointer('/a/1/x').lookup(self.doc), (0, None))
+        self.assertEqual(DefaultPointer('/x').resolve(self.doc, None), 0)
+
+    def test_subclass_walk_compiled(self):
+        class CaseInsensitivePointer(JsonPointer):
+            __slots__ = ()
+
+            def walk(self, doc, part):
+                return super().walk(doc, part.lower())
+
+        doc = {'a': 1, 'A': 2, 'l': [{'b': 3}]}
+        ptr = CaseInsensitivePointer('/A')
+        self.assertEqual(ptr.resolve(doc), 1)
+        self.assertEqual(ptr.lookup(doc), (1, None))
+        self.assertEqual(ptr.compile()(doc), 1)
+
+        get = CaseInsensitivePointer('/L/0/B').compile()
+        self.assertEqual(get(doc), 3)
+        self.assertEqual(get({}, None), None)
+        self.assertRaises(JsonPointerException, get, {})
+
+    def test_bounded_message(self):
+        items = list(range(1000))
+        doc = {'k%d' % i: items for i in range(100000)}
+        with self.assertRaises(JsonPointerException) as cm:
+            resolve_pointer(doc, '/nope')
+
+        message = str(cm.exception)
+        self.assertTrue(message.startswith("member 'nope' not found in {'k0': [0, 1, 2"))
+        self.assertTrue(len(message) < 1000)
+        self.assertEqual(repr(cm.exception), 'JsonPointerException(%r)' % message)
+
+        long_part = 'x' * 10000
+        message = str(JsonPointerException._deferred("member '%s' not found", long_part))
+        self.assertTrue(len(message) < 300)
+
+    def test_plain_message(self):
+        ex = JsonPointerException('Cannot delete root')
+        self.assertEqual(str(ex), 'Cannot delete root')
+        self.assertEqual(str(JsonPointerException()), '')
+        ex = JsonPointerException._deferred("index '%s' is out of bounds", 5)
+        ex = pickle.loads(pickle.dumps(ex))
+        self.assertEqual(str(ex), "index '5' is out of bounds")
+
+    def test_several_arguments(self):
+        # arguments are not a format string with its arguments
+        for args in [('bad thing', 'detail'), ('100% wrong', 1), ('%s', 1, 2)]:
+            ex = JsonPointerException(*args)
+            self.assertEqual(str(ex), str(args))
+            self.assertEqual(ex.args, args)
+            self.assertEqual(repr(ex), 'JsonPointerException%r' % (args,))
+
+
+class ResolveManyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {
+            'data': {
+                'items': [{'a': 1, 'b': [2, 3]}, {'a': 4}],
+                'name': 'x',
+            },
+            'a/b': 5,
+        }
+
+    def test_input_order(self):
+        pointers = ['/data/name', '/data/items/0/b/1', '', '/a~1b',
+                    '/data/items/1/a', '/data/items/0/a', '/data/name']
+        self.assertEqual(resolve_many(self.doc, pointers),
+                         [resolve_pointer(self.doc, p) for p in pointers])
+
+    def test_pointer_objects(self):
+        pointers = [JsonPointer('/data/items/1'), '/data/items/1/a']
+        self.assertEqual(resolve_many(self.doc, pointers), [{'a': 4}, 4])
+
+    def test_empty(self):
+        self.assertEqual(resolve_many(self.doc, []), [])
+
+    def test_default(self):
+        pointers = ['/data/items/1/b', '/data/items/5', '/data/items/0/a',
+                    '/missing/deeper', '/data/items/-/a']
+        self.assertEqual(resolve_many(self.doc, pointers, None),
+                         [None, None, 1, None, None])
+
+    def test_defaults_per_pointer(self):
+        pointers = ['/data/items/5', '/data/name', '/missing/deeper', '/zzz']
+        self.assertEqual(resolve_many(self.doc, pointers, defaults=[0, 1, 2, 3]),
+                         [0, 'x', 2, 3])
+        self.assertEqual(resolve_many(self.doc, pointers, None, {'/zzz': []}),
+                         [None, 'x', None, []])
+
+        # a default that is a list is one value, not one per pointer
+        self.assertEqual(resolve_many(self.doc, pointers[:1], [0, 1]), [[0, 1]])
+
+        # pointers without any default still raise
+        with self.assertRaises(JsonPointerException) as cm:
+            resolve_many(self.doc, pointers, defaults={'/data/items/5': 0})
+        self.assertIn("'missing'", str(cm.exception))
+
+    def test_eol(self):
+        result = resolve_many(self.doc, ['/data/items/-'])
+        self.assertIsInstance(result[0], EndOfList)
+
+    def test_raises_first_error(self):
+        with self.assertRaises(JsonPointerException) as cm:
+            resolve_many(self.doc, ['/data/name', '/data/items/x', '/zzz'])
+        self.assertIn("'x'", str(cm.exception))
+
+    def test_invalid_pointer(self):
+        self.assertRaises(JsonPointerException, resolve_many, self.doc, ['a'])
+
+
+class CompileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {'foo': [{'prop': 44}, 'bar'], '': 0, 'a/b': 1, 'm~n': 2}
+
+    def test_resolve(self):
+        for path in ['', '/foo', '/foo/0/prop', '/foo/1', '/', '/a~1b', '/m~0n']:
+            ptr = JsonPointer(path)
+            self.assertEqual(ptr.compile()(self.doc), ptr.resolve(self.doc))
+
+    def test_eol(self):
+        get = JsonPointer('/foo/-').compile()
+        self.assertIsInstance(get(self.doc), EndOfList)
+
+    def test_errors(self):
+        for path in ['/foo/2', '/foo/01', '/foo/x', '/foo/-/prop', '/baz',
+                     '/foo/1/x']:
+            get = JsonPointer(path).compile()
+            self.assertRaises(JsonPointerException, get, self.doc)
+            self.assertEqual(get(self.doc, 'default'), 'default')
+
+    def test_numeric_member(self):
+        # numeric parts still work as member names of mappings
+        get = JsonPointer('/1').compile()
+        self.assertEqual(get({'1': 'x'}), 'x')
+        self.assertEqual(get(['a', 'b']), 'b')
+        self.assertEqual(get('ab'), 'b')
+
+    def test_alt_types(self):
+        # subclasses and custom types take the generic path
+        class mydict(dict):
+            pass
+
+        doc = mydict(foo=(1, 2))
+        self.assertEqual(JsonPointer('/foo/1').compile()(doc), 2)
+        self.assertEqual(JsonPointer('/root/1/2').compile()(AltTypesTests.mdict), '3')
+
+
 class ToLastTests(unittest.TestCase):
 
     def test_empty_path(self):
@@ -297,6 +557,1295 @@ class SetTests(unittest.TestCase):
         self.assertRaises(JsonPointerException, set_pointer, doc, "", 9)
 
 
+class PointerCacheTests(unittest.TestCase):
+
+    def tearDown(self):
+        jsonpointer.disable_pointer_cache()
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(jsonpointer.get_pointer_cache())
+
+    def test_module_helpers_use_cache(self):
+        cache = jsonpointer.enable_pointer_cache(maxsize=8)
+        self.assertIs(jsonpointer.get_pointer_cache(), cache)
+
+        doc = {'foo': [1, 2]}
+        self.assertEqual(resolve_pointer(doc, '/foo/1'), 2)
+        set_pointer(doc, '/foo/1', 3)
+        self.assertEqual(resolve_pointer(doc, '/foo/1'), 3)
+        self.assertEqual(resolve_pointer(doc, '/bar', None), None)
+
+        info = cache.info()
+        self.assertEqual(info.hits, 2)
+        self.assertEqual(info.misses, 2)
+        self.assertEqual(info.currsize, 2)
+
+    def test_eviction(self):
+        cache = jsonpointer.PointerCache(maxsize=2)
+        cache.get('/a')
+        cache.get('/b')
+        cache.get('/a')
+        cache.get('/c')
+
+        self.assertIn('/a', cache)
+        self.assertNotIn('/b', cache)
+        self.assertIn('/c', cache)
+        self.assertEqual(cache.info().evictions, 1)
+
+    def test_cached_pointers_are_shared(self):
+        cache = jsonpointer.PointerCache()
+        ptr1 = cache.get('/a/b')
+        ptr2 = cache.get('/a/b')
+        self.assertIs(ptr1, ptr2)
+
+    def test_invalid_pointer_not_cached(self):
+        cache = jsonpointer.PointerCache()
+        self.assertRaises(JsonPointerException, cache.get, '/a~2')
+        self.assertRaises(JsonPointerException, cache.get, 'a')
+        self.assertEqual(len(cache), 0)
+
+    def test_clear(self):
+        cache = jsonpointer.PointerCache()
+        cache.get('/a')
+        cache.get('/a')
+        cache.clear()
+        self.assertEqual(cache.info(), jsonpointer.CacheInfo(0, 0, 0, 1024, 0))
+
+    def test_invalid_maxsize(self):
+        self.assertRaises(ValueError, jsonpointer.PointerCache, 0)
+
+    def test_join_and_from_parts(self):
+        cache = jsonpointer.enable_pointer_cache()
+        ptr = JsonPointer('/a')
+        self.assertEqual(ptr.join('/b').path, '/a/b')
+        self.assertEqual(ptr.join('/b').path, '/a/b')
+        # parts are not parsed, so they do not go through the cache
+        self.assertEqual((ptr / ['b']).path, '/a/b')
+        self.assertEqual(JsonPointer.from_parts(['a', 'b']).path, '/a/b')
+        self.assertEqual(cache.info()[:2], (1, 1))
+
+
+class ShareStructureSetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {
+            'foo': {'bar': [1, {'x': 2}], 'baz': {'y': 3}},
+            'qux': [4, 5],
+        }
+        self.orig = copy.deepcopy(self.doc)
+
+    def test_set(self):
+        new = set_pointer(self.doc, '/foo/bar/1/x', 9, inplace=False,
+                          share_structure=True)
+        self.assertEqual(resolve_pointer(new, '/foo/bar/1/x'), 9)
+        self.assertEqual(self.doc, self.orig)
+
+        # containers on the path are copied, everything else is shared
+        self.assertIsNot(new, self.doc)
+        self.assertIsNot(new['foo'], self.doc['foo'])
+        self.assertIsNot(new['foo']['bar'], self.doc['foo']['bar'])
+        self.assertIs(new['foo']['baz'], self.doc['foo']['baz'])
+        self.assertIs(new['qux'], self.doc['qux'])
+
+    def test_append_and_add(self):
+        new = set_pointer(self.doc, '/qux/-', 6, inplace=False,
+                          share_structure=True)
+        self.assertEqual(new['qux'], [4, 5, 6])
+
+        new = set_pointer(self.doc, '/foo/new', 7, inplace=False,
+                          share_structure=True)
+        self.assertEqual(new['foo']['new'], 7)
+        self.assertEqual(self.doc, self.orig)
+
+    def test_root(self):
+        new = set_pointer(self.doc, '', 1, inplace=False, share_structure=True)
+        self.assertEqual(new, 1)
+
+    def test_invalid(self):
+        for path in ['/missing/x', '/qux/-/x', '/qux/7/x', '/qux/a']:
+            self.assertRaises(JsonPointerException, set_pointer, self.doc,
+                              path, 1, inplace=False, share_structure=True)
+        self.assertEqual(self.doc, self.orig)
+
+
+class DeleteTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {'foo': ['a', 'b', 'c'], 'bar': {'x': 1, 'y': {'z': 2}}}
+        self.orig = copy.deepcopy(self.doc)
+
+    def test_delete(self):
+        delete_pointer(self.doc, '/foo/0')
+        self.assertEqual(self.doc['foo'], ['b', 'c'])
+        delete_pointer(self.doc, '/bar/y')
+        self.assertEqual(self.doc['bar'], {'x': 1})
+
+    def test_delete_copy(self):
+        new = delete_pointer(self.doc, '/bar/y/z', inplace=False)
+        self.assertEqual(new['bar']['y'], {})
+        self.assertEqual(self.doc, self.orig)
+
+        new = delete_pointer(self.doc, '/bar/y/z', inplace=False,
+                             share_structure=True)
+        self.assertEqual(new['bar']['y'], {})
+        self.assertIs(new['foo'], self.doc['foo'])
+        self.assertEqual(self.doc, self.orig)
+
+    def test_delete_invalid(self):
+        for path in ['', '/foo/-', '/foo/3', '/bar/q', '/bar/x/q']:
+            self.assertRaises(JsonPointerException, delete_pointer,
+                              self.doc, path)
+        self.assertEqual(self.doc, self.orig)
+
+
+class ApplyManyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {'foo': ['a', 'b'], 'bar': {'x': 1, 'y': {'z': 2}}}
+        self.orig = copy.deepcopy(self.doc)
+        self.writes = [
+            ('/foo/-', 'c'),
+            ('/bar/y/z', 3),
+            ('/foo/0', 'A'),
+            ('/foo/-', 'd'),
+            ('/bar/new', {'v': 0}),
+            ('/bar/new/w', 1),
+            (JsonPointer('/bar/x'), 5),
+        ]
+        self.expected = {
+            'foo': ['A', 'b', 'c', 'd'],
+            'bar': {'x': 5, 'y': {'z': 3}, 'new': {'v': 0, 'w': 1}},
+        }
+
+    def test_inplace(self):
+        result = apply_many(self.doc, self.writes)
+        self.assertIs(result, self.doc)
+        self.assertEqual(self.doc, self.expected)
+
+    def test_matches_sequential_sets(self):
+        doc = copy.deepcopy(self.doc)
+        for ptr, value in self.writes:
+            set_pointer(doc, ptr, copy.deepcopy(value))
+        self.assertEqual(apply_many(self.doc, self.writes), doc)
+
+    def test_later_ancestor_wins(self):
+        writes = [('/bar/x', 5), ('/foo/-', 'c'), ('/bar', {'y': 1}), ('/bar/z', 2),
+                  ('/foo', []), ('/foo/-', 'd')]
+        expected = copy.deepcopy(self.doc)
+        for ptr, value in writes:
+            set_pointer(expected, ptr, copy.deepcopy(value))
+
+        for inplace in (True, False):
+            doc = copy.deepcopy(self.doc)
+            values = copy.deepcopy(writes)
+            self.assertEqual(apply_many(doc, values, inplace=inplace), expected)
+            self.assertEqual(expected, {'foo': ['d'], 'bar': {'y': 1, 'z': 2}})
+            if not inplace:
+                # the replaced writes are not replayed into the new value
+                self.assertEqual(values[2][1], {'y': 1})
+
+        self.assertEqual(apply_many({'a': {'x': 1}}, [('/a/x', 5), ('/a', {'y': 1})]),
+                         {'a': {'y': 1}})
+
+    def test_copy(self):
+        for share_structure in (False, True):
+            result = apply_many(self.doc, self.writes, inplace=False,
+                                share_structure=share_structure)
+            self.assertEqual(result, self.expected)
+            self.assertEqual(self.doc, self.orig)
+            # values written into are not modified either
+            self.assertEqual(self.writes[4][1], {'v': 0})
+
+    def test_share_structure(self):
+        result = apply_many(self.doc, [('/bar/y/z', 0)], inplace=False,
+                            share_structure=True)
+        self.assertIs(result['foo'], self.doc['foo'])
+        self.assertIsNot(result['bar'], self.doc['bar'])
+
+    def test_root(self):
+        self.assertRaises(JsonPointerException, apply_many, self.doc, [('', 1)])
+        self.assertEqual(apply_many(self.doc, [('', {}), ('/a', 1)], inplace=False),
+                         {'a': 1})
+        self.assertEqual(apply_many(self.doc, []), self.orig)
+
+    def test_invalid(self):
+        self.assertRaises(JsonPointerException, apply_many, self.doc,
+                          [('/foo/-/x', 1)])
+        self.assertRaises(JsonPointerException, apply_many, self.doc,
+                          [('/missing/x', 1)])
+
+
+class DeleteManyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {'foo': ['a', 'b', 'c', 'd'], 'bar': {'x': 1, 'y': {'z': 2}}}
+        self.orig = copy.deepcopy(self.doc)
+
+    def test_original_positions(self):
+        result = delete_many(self.doc, ['/foo/0', '/foo/3', '/foo/1',
+                                        '/bar/y/z', '/bar/y/z'])
+        self.assertIs(result, self.doc)
+        self.assertEqual(self.doc, {'foo': ['c'], 'bar': {'x': 1, 'y': {}}})
+
+    def test_nested_targets(self):
+        # removing /bar removes everything below it
+        delete_many(self.doc, ['/bar/y/z', '/bar', '/bar/x'])
+        self.assertEqual(self.doc, {'foo': ['a', 'b', 'c', 'd']})
+
+    def test_copy(self):
+        for share_structure in (False, True):
+            result = delete_many(self.doc, ['/foo/2', '/bar/y/z'],
+                                 inplace=False, share_structure=share_structure)
+            self.assertEqual(result, {'foo': ['a', 'b', 'd'],
+                                      'bar': {'x': 1, 'y': {}}})
+            self.assertEqual(self.doc, self.orig)
+
+    def test_invalid(self):
+        self.assertRaises(JsonPointerException, delete_many, self.doc, [''])
+        self.assertRaises(JsonPointerException, delete_many, self.doc, ['/foo/9'])
+        self.assertRaises(JsonPointerException, delete_many, self.doc, ['/foo/-'])
+        self.assertRaises(JsonPointerException, delete_many, self.doc, ['/q/x'])
+
+
+class ExtractColumnsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docs = [
+            {'id': 1, 'price': 2.5, 'ok': True, 'name': 'a', 'tags': ['x']},
+            {'id': 2, 'ok': False, 'name': 'b', 'tags': []},
+            {'id': 3, 'price': 4, 'name': None},
+        ]
+        self.pointers = ['/id', '/price', '/ok', '/name', '/tags/0', '/nope']
+
+    def extract(self, docs=None, **kwargs):
+        kwargs.setdefault('use_numpy', False)
+        return jsonpointer.extract_columns(
+            self.docs if docs is None else docs, self.pointers, **kwargs)
+
+    def test_types(self):
+        columns = self.extract()
+        self.assertEqual(list(columns), self.pointers)
+        self.assertEqual(columns['/id'], (array('q', [1, 2, 3]), array('b', [0, 0, 0])))
+        self.assertEqual(columns['/price'], (array('d', [2.5, 0, 4]), array('b', [0, 1, 0])))
+        self.assertEqual(columns['/ok'], (array('b', [1, 0, 0]), array('b', [0, 0, 1])))
+        self.assertEqual(columns['/name'], (['a', 'b', None], array('b', [0, 0, 0])))
+        self.assertEqual(columns['/tags/0'], (['x', None, None], array('b', [0, 1, 1])))
+        self.assertEqual(columns['/nope'], ([None, None, None], array('b', [1, 1, 1])))
+
+    def test_chunks(self):
+        docs = [{'v': i} for i in range(10)] + [{'v': 0.5}, {'v': 'x'}, {}, {'v': True}]
+        self.pointers = ['/v']
+        for chunk_size in (1, 3, 100):
+            column = self.extract(iter(docs), chunk_size=chunk_size)['/v']
+            self.assertEqual(column.values, list(range(10)) + [0.5, 'x', None, True])
+            self.assertEqual(list(column.missing), [0] * 12 + [1, 0])
+
+        # integers are widened to floats
+        column = self.extract([{'v': 1}, {'v': 0.5}], chunk_size=1)['/v']
+        self.assertEqual(column.values, array('d', [1.0, 0.5]))
+
+        # booleans stay booleans when mixed with other types
+        column = self.extract([{'v': True}, {}, {'v': 2}], chunk_size=1)['/v']
+        self.assertEqual(column.values, [True, None, 2])
+
+    def test_end_of_list(self):
+        self.pointers = ['/l/-', '/m/-']
+        columns = self.extract([{'l': [], 'm': {'-': 1}}, {'l': [1]}])
+        self.assertEqual(columns['/l/-'], ([None, None], array('b', [1, 1])))
+        self.assertEqual(columns['/m/-'], (array('q', [1, 0]), array('b', [0, 1])))
+
+    def test_big_integers(self):
+        self.pointers = ['/v']
+        column = self.extract([{'v': 1}, {'v': 2 ** 70}, {'v': 3}], chunk_size=2)['/v']
+        self.assertEqual(column.values, [1, 2 ** 70, 3])
+
+    def test_defaults(self):
+        columns = self.extract(defaults={'/price': -1, '/tags/0': 'none', '/nope': 0})
+        self.assertEqual(columns['/price'].values, array('d', [2.5, -1, 4]))
+        self.assertEqual(columns['/tags/0'].values, ['x', 'none', 'none'])
+        self.assertEqual(columns['/nope'], (array('q', [0, 0, 0]), array('b', [1, 1, 1])))
+
+        columns = self.extract(defaults=[None, -1.5])
+        self.assertEqual(columns['/price'].values, array('d', [2.5, -1.5, 4]))
+
+    def test_empty(self):
+        columns = self.extract([])
+        self.assertEqual(columns['/id'], ([], array('b')))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy(self):
+        columns = self.extract(use_numpy=True)
+        self.assertEqual(columns['/id'].values.dtype, numpy.int64)
+        self.assertEqual(columns['/price'].values.tolist(), [2.5, 0.0, 4.0])
+        self.assertEqual(columns['/price'].missing.tolist(), [False, True, False])
+        self.assertEqual(columns['/ok'].values.tolist(), [True, False, False])
+        self.assertEqual(columns['/name'].values.dtype, object)
+        self.assertEqual(columns['/name'].values.tolist(), ['a', 'b', None])
+
+
+class StreamTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {
+            'meta': {'version': 3, 's': 'a"b\\', 'e': [], 'o': {}},
+            'data': [1, 2.5e3, {'x/y': [True, None, '\xe9']}],
+            '': -1,
+            'k"': 'v',
+        }
+        self.pointers = ['', '/meta', '/meta/version', '/meta/s', '/data/1',
+                         '/data/2/x~1y/2', '/', '/k"', '/meta/e', '/meta/o',
+                         '/data/2', '/data/2/x~1y']
+
+    def test_chunk_sizes(self):
+        expected = [resolve_pointer(self.doc, p) for p in self.pointers]
+        for text in (json.dumps(self.doc), json.dumps(self.doc, indent=2)):
+            for chunk_size in (1, 2, 3, 7, 4096):
+                fp = io.BytesIO(text.encode('utf-8'))
+                result = jsonpointer.resolve_stream_many(fp, self.pointers,
+                                                         chunk_size=chunk_size)
+                self.assertEqual(result, expected)
+
+    def test_text_input(self):
+        fp = io.StringIO(json.dumps(self.doc))
+        self.assertEqual(jsonpointer.resolve_stream(fp, '/data/2/x~1y/2'), '\xe9')
+
+    def test_stops_reading(self):
+        fp = io.BytesIO(b'{"a": {"b": 1}, "c": [' + b'0, ' * 1000 + b'0]}')
+        self.assertEqual(jsonpointer.resolve_stream(fp, '/a/b', chunk_size=4), 1)
+        self.assertTrue(fp.tell() < 20)
+
+    def test_missing(self):
+        fp = io.BytesIO(json.dumps(self.doc).encode('utf-8'))
+        pointers = ['/nope', '/data/9', '/meta/version/x', '/data/-', '/data/2/q/r']
+        self.assertEqual(jsonpointer.resolve_stream_many(fp, pointers, None),
+                         [None] * len(pointers))
+
+        fp = io.BytesIO(json.dumps(self.doc).encode('utf-8'))
+        self.assertRaises(JsonPointerException, jsonpointer.resolve_stream,
+                          fp, '/data/01')
+
+    def test_invalid_json(self):
+        for text in [b'{"a": ', b'{"a" 1}', b'[1 2]', b'{"a": "x', b'[,]']:
+            self.assertRaises(ValueError, jsonpointer.resolve_stream,
+                              io.BytesIO(text), '/b/c', None)
+
+    def test_large_target(self):
+        # the target spans tens of thousands of chunks; copying the buffer
+        # for every chunk would take far too long
+        doc = {'a': ['x' * 100] * 50000, 'b': 1}
+        fp = io.BytesIO(json.dumps(doc).encode('utf-8'))
+        self.assertEqual(jsonpointer.resolve_stream_many(fp, ['/a', '/b'], chunk_size=64),
+                         [doc['a'], 1])
+
+    def test_scalar_across_chunks(self):
+        fp = io.BytesIO(b'{"a": 12345678, "b": [true, 1]}')
+        self.assertEqual(jsonpointer.resolve_stream_many(fp, ['/a', '/b/0'], chunk_size=3),
+                         [12345678, True])
+
+
+class AsyncStreamTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.doc = {'meta': {'version': 3}, 'data': [1, {'x': 'y'}], 'rest': list(range(1000))}
+        self.text = json.dumps(self.doc).encode('utf-8')
+
+    def reader(self, data):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return reader
+
+    async def test_stream_reader(self):
+        pointers = ['/data/1/x', '/meta', '']
+        for chunk_size in (1, 5, 4096):
+            result = await jsonpointer.aresolve_stream_many(
+                self.reader(self.text), pointers, chunk_size=chunk_size)
+            self.assertEqual(result, [resolve_pointer(self.doc, p) for p in pointers])
+
+    async def test_stops_reading(self):
+        reader = self.reader(self.text)
+        value = await jsonpointer.aresolve_stream(reader, '/meta/version', chunk_size=8)
+        self.assertEqual(value, 3)
+        rest = await reader.read()
+        self.assertTrue(rest.endswith(b'998, 999]}'))
+
+    async def test_closes_iterator(self):
+        events = []
+
+        async def chunks():
+            try:
+                for i in range(0, len(self.text), 10):
+                    events.append(i)
+                    yield self.text[i:i + 10].decode('utf-8')
+            finally:
+                events.append('closed')
+
+        value = await jsonpointer.aresolve_stream(chunks(), '/data/1')
+        self.assertEqual(value, {'x': 'y'})
+        self.assertEqual(events[-1], 'closed')
+        self.assertTrue(len(events) < 10)
+
+    async def test_missing(self):
+        with self.assertRaises(JsonPointerException):
+            await jsonpointer.aresolve_stream(self.reader(self.text), '/nope')
+        value = await jsonpointer.aresolve_stream(self.reader(self.text), '/nope', None)
+        self.assertIsNone(value)
+
+    async def test_invalid(self):
+        with self.assertRaises(ValueError):
+            await jsonpointer.aresolve_stream(self.reader(b'{"a": [1,'), '/b')
+
+    async def test_concurrent(self):
+        reader = asyncio.StreamReader()
+        task = asyncio.ensure_future(jsonpointer.aresolve_stream(reader, '/a/b'))
+
+        reader.feed_data(b'{"a": {"b"')
+        await asyncio.sleep(0)
+        self.assertFalse(task.done())
+
+        reader.feed_data(b': 1}, "c": ')
+        self.assertEqual(await task, 1)
+
+
+class ResolveRawTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {
+            'meta': {'version': 3, 's': 'a"b\\', 'e': [], 'o': {}},
+            'data': [1, 2.5e3, {'x/y': [True, None, '\xe9']}],
+            '': -1,
+        }
+
+    def test_targets(self):
+        for text in (json.dumps(self.doc), json.dumps(self.doc, indent=2)):
+            buf = text.encode('utf-8')
+            for ptr in ['', '/meta', '/meta/version', '/meta/s', '/data/1',
+                        '/data/2/x~1y/2', '/', '/meta/e', '/meta/o']:
+                span = jsonpointer.resolve_raw(buf, ptr)
+                self.assertIsInstance(span, memoryview)
+                self.assertEqual(json.loads(bytes(span)), resolve_pointer(self.doc, ptr))
+
+    def test_zero_copy(self):
+        buf = bytearray(b'{"a": [1, "xyz"]}')
+        span = jsonpointer.resolve_raw(memoryview(buf), '/a/1')
+        self.assertEqual(span.tobytes(), b'"xyz"')
+        buf[12] = ord('Y')
+        self.assertEqual(span.tobytes(), b'"xYz"')
+        span.release()
+
+    def test_mmap(self):
+        import mmap
+        with tempfile.TemporaryFile() as f:
+            f.write(json.dumps(self.doc).encode('utf-8'))
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                span = jsonpointer.resolve_raw(buf, '/data/2')
+                self.assertEqual(bytes(span), b'{"x/y": [true, null, "\\u00e9"]}')
+                span.release()
+
+    def test_missing(self):
+        buf = json.dumps(self.doc).encode('utf-8')
+        self.assertRaises(JsonPointerException, jsonpointer.resolve_raw, buf, '/nope')
+        self.assertRaises(JsonPointerException, jsonpointer.resolve_raw, buf, '/data/-')
+        self.assertIsNone(jsonpointer.resolve_raw(buf, '/meta/version/x', None))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, jsonpointer.resolve_raw, b'{"a": [1', '/b')
+        self.assertRaises(ValueError, jsonpointer.resolve_raw, b'', '')
+
+
+class JsonFileIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {
+            'meta': {'version': 3, 'name': 'x"y'},
+            'data': [{'a': 1, 'b': [1, 2]}, {'a': 2}, []],
+            'a/b': {'m~n': None},
+        }
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'doc.json')
+        with open(self.path, 'w') as f:
+            json.dump(self.doc, f, indent=2)
+
+    def test_resolve(self):
+        pointers = ['', '/meta', '/meta/name', '/data/0/b/1', '/data/2',
+                    '/a~1b/m~0n', '/data/1']
+        for depth in (0, 1, 2, 5):
+            with jsonpointer.JsonFileIndex.open(self.path, depth) as index:
+                for ptr in pointers:
+                    self.assertEqual(index.resolve(ptr),
+                                     resolve_pointer(self.doc, ptr))
+
+    def test_missing(self):
+        with jsonpointer.JsonFileIndex.open(self.path, 1) as index:
+            for ptr in ['/nope', '/data/7', '/data/0/c', '/meta/version/x']:
+                self.assertIsNone(index.resolve(ptr, None))
+                self.assertRaises(JsonPointerException, index.resolve, ptr)
+
+    def test_sidecar(self):
+        jsonpointer.JsonFileIndex.open(self.path, 2).close()
+        self.assertTrue(os.path.exists(self.path + '.jpidx'))
+
+        index = jsonpointer.JsonFileIndex(self.path, 2)
+        self.assertTrue(index.load())
+        self.assertEqual(index.resolve('/data/0/a'), 1)
+        index.close()
+
+        # a different depth or a changed file invalidate the index
+        self.assertFalse(jsonpointer.JsonFileIndex(self.path, 3).load())
+        with open(self.path, 'w') as f:
+            json.dump({'data': [{'a': 5}]}, f)
+        self.assertFalse(jsonpointer.JsonFileIndex(self.path, 2).load())
+
+        with jsonpointer.JsonFileIndex.open(self.path, 2) as index:
+            self.assertEqual(index.resolve('/data/0/a'), 5)
+
+    def test_spans(self):
+        with jsonpointer.JsonFileIndex.open(self.path, 1) as index:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            start, end = index.spans['/meta']
+            self.assertEqual(json.loads(raw[start:end]), self.doc['meta'])
+            self.assertNotIn('/meta/version', index.spans)
+
+    def test_empty_file(self):
+        with open(self.path, 'w'):
+            pass
+        self.assertRaises(ValueError, jsonpointer.JsonFileIndex.open, self.path)
+
+    def test_loaded_spans(self):
+        with jsonpointer.JsonFileIndex.open(self.path, 2) as index:
+            spans = dict(index.spans)
+
+        with jsonpointer.JsonFileIndex.open(self.path, 2) as index:
+            self.assertIsInstance(index.spans, jsonpointer._SpanTable)
+            self.assertEqual(dict(index.spans), spans)
+            self.assertEqual(len(index.spans), len(spans))
+            self.assertNotIn('/data/3', index.spans)
+
+    def test_missing_within_depth(self):
+        jsonpointer.JsonFileIndex.open(self.path, 2).close()
+        with jsonpointer.JsonFileIndex.open(self.path, 2) as index:
+            for ptr in ['/nope/x', '/data/9/a', '/data/01', '/data/-', '/meta/x/y']:
+                self.assertIsNone(index.resolve(ptr, None))
+                self.assertRaises(JsonPointerException, index.resolve, ptr)
+            # the JSON file itself has not been read
+            self.assertIsNone(index._mmap)
+
+    def test_missing_below_depth(self):
+        for depth in (0, 1):
+            with self.assertRaises(JsonPointerException) as cm:
+                with jsonpointer.JsonFileIndex.open(self.path, depth) as index:
+                    for ptr in ['/data/0/b/7', '/data/0/b/-', '/a~1b/m~0n/x']:
+                        self.assertIsNone(index.resolve(ptr, None))
+                    index.resolve('/a~1b/c/9')
+            # the error names the whole pointer, and closing the index
+            # after it does not fail
+            self.assertIn("'/a~1b/c/9'", str(cm.exception))
+
+    def test_stale_format(self):
+        for content in [b'{"version": 1}', b'JPIDX {"version": 2', b'']:
+            with open(self.path + '.jpidx', 'wb') as f:
+                f.write(content)
+            self.assertFalse(jsonpointer.JsonFileIndex(self.path, 2).load())
+
+        # a truncated table
+        jsonpointer.JsonFileIndex.open(self.path, 2).close()
+        with open(self.path + '.jpidx', 'r+b') as f:
+            f.truncate(len(f.readline()) + 8)
+        self.assertFalse(jsonpointer.JsonFileIndex(self.path, 2).load())
+        with jsonpointer.JsonFileIndex.open(self.path, 2) as index:
+            self.assertEqual(index.resolve('/meta/name'), 'x"y')
+
+
+class ServerTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.paths = [os.path.join(tmp.name, name) for name in ('a.json', 'b.json')]
+        for path, doc in zip(self.paths, [{'a': {'b': [1, 2]}}, {'x': 'y'}]):
+            with open(path, 'w') as f:
+                json.dump(doc, f)
+
+        self.socket_path = os.path.join(tmp.name, 'sock')
+        self.server = jsonpointer.JsonPointerServer(self.paths, poll_interval=0.01)
+        self.listener = await self.server.start(self.socket_path)
+        self.addAsyncCleanup(self.listener.wait_closed)
+        self.addCleanup(self.server.close)
+
+        self.reader, self.writer = await asyncio.open_unix_connection(self.socket_path)
+        self.addCleanup(self.writer.close)
+
+    async def request(self, request):
+        if isinstance(request, str):
+            request = request.encode('utf-8')
+        elif not isinstance(request, bytes):
+            request = json.dumps(request).encode('utf-8')
+        self.writer.write(request + b'\n')
+        return json.loads(await self.reader.readline())
+
+    async def test_resolve(self):
+        self.assertEqual(await self.request('/a/b/1'), {'value': 2})
+        self.assertEqual(await self.request({'op': 'resolve', 'pointer': '/x',
+                                             'doc': self.paths[1]}),
+                         {'value': 'y'})
+        self.assertEqual(await self.request({'pointer': '/nope', 'default': 0}),
+                         {'value': 0})
+
+    async def test_batch(self):
+        response = await self.request({'op': 'batch', 'pointers': ['', '/a/b', '/c'],
+                                       'default': None})
+        self.assertEqual(response, {'value': [{'a': {'b': [1, 2]}}, [1, 2], None]})
+
+    async def test_set(self):
+        self.assertEqual(await self.request({'op': 'set', 'pointer': '/a/b/-', 'value': 3}),
+                         {'value': None})
+        self.assertEqual(await self.request('/a/b'), {'value': [1, 2, 3]})
+        await self.request({'op': 'set', 'pointer': '', 'value': [0]})
+        self.assertEqual(await self.request('/0'), {'value': 0})
+
+    async def test_errors(self):
+        for request in ['/nope', '/a/b/5', '{"op": "resolve"}', '{"op": "drop", "pointer": ""}',
+                        '{"pointer": "", "doc": "other.json"}', '{not json', 'a',
+                        '{"op": "set", "pointer": "/a/b/9", "value": 1}',
+                        '{"op": "set", "pointer": "/a/b/0/x", "value": 1}',
+                        '{"op": "batch", "pointers": 5}', '[1]', b'\xff']:
+            response = await self.request(request)
+            self.assertEqual(list(response), ['error'])
+
+        # the connection is still usable
+        self.assertEqual(await self.request('/a/b/0'), {'value': 1})
+
+    async def test_reload(self):
+        with open(self.paths[0], 'w') as f:
+            json.dump({'a': 'changed'}, f)
+        # make sure the version differs even with a coarse clock
+        os.utime(self.paths[0], ns=(0, 0))
+
+        for _ in range(200):
+            if (await self.request('/a')) == {'value': 'changed'}:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(await self.request('/a'), {'value': 'changed'})
+
+        # a broken file keeps the previous document
+        with open(self.paths[0], 'w') as f:
+            f.write('{')
+        os.utime(self.paths[0], ns=(1, 1))
+        self.assertEqual(self.server.reload(), [])
+        self.assertEqual(await self.request('/a'), {'value': 'changed'})
+
+    async def test_client(self):
+
+        def use_client():
+            with jsonpointer.JsonPointerClient(self.socket_path) as client:
+                client.set('/a/c', True)
+                self.assertEqual(client.resolve('/a/c'), True)
+                self.assertEqual(client.resolve(JsonPointer('/x'), self.paths[1]), 'y')
+                self.assertEqual(client.resolve_many(['/a/b/0', '/z'], default=None),
+                                 [1, None])
+                self.assertRaises(JsonPointerException, client.resolve, '/z')
+
+        await asyncio.to_thread(use_client)
+
+
+class PointerIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {'foo': {'bar': [{'a': 1}, {'a': 2}, {'a': 3}]}, 'baz': None}
+        self.index = jsonpointer.PointerIndex(self.doc)
+
+    def test_resolve(self):
+        for path in ['/foo/bar/1/a', '/foo/bar/1/a', '/foo/bar/2', '', '/baz',
+                     '/foo/bar/0/a', '/baz']:
+            self.assertEqual(self.index.resolve(path),
+                             resolve_pointer(self.doc, path))
+        # the root is always a hit
+        self.assertEqual(self.index.info().hits, 3)
+
+    def test_missing(self):
+        self.assertRaises(JsonPointerException, self.index.resolve, '/foo/x')
+        self.assertEqual(self.index.resolve('/foo/bar/7/a', None), None)
+        self.assertEqual(self.index.resolve('/baz/q', 1), 1)
+        self.assertIsInstance(self.index.resolve('/foo/bar/-'), EndOfList)
+        # the prefixes of failed lookups are still recorded
+        self.assertEqual(self.index.resolve('/foo/bar'), self.doc['foo']['bar'])
+        self.assertEqual(self.index.info().hits, 1)
+
+    def test_set_invalidates(self):
+        self.assertEqual(self.index.resolve('/foo/bar/1/a'), 2)
+        self.index.set('/foo/bar/1', {'a': 5})
+        self.assertEqual(self.index.resolve('/foo/bar/1/a'), 5)
+        self.index.set('/foo/bar/-', {'a': 6})
+        self.assertEqual(self.index.resolve('/foo/bar/3/a'), 6)
+        self.index.set('', {'foo': 0})
+        self.assertEqual(self.index.resolve('/foo'), 0)
+
+    def test_delete_invalidates(self):
+        self.assertEqual(self.index.resolve('/foo/bar/1/a'), 2)
+        self.index.delete('/foo/bar/0')
+        self.assertEqual(self.index.resolve('/foo/bar/1/a'), 3)
+        self.index.delete('/foo/bar')
+        self.assertEqual(self.index.resolve('/foo/bar', None), None)
+
+    def test_invalidate(self):
+        self.index.resolve('/foo/bar/1/a')
+        self.index.resolve('/baz')
+        self.doc['foo']['bar'] = []
+        self.index.invalidate('/foo/bar')
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.resolve('/foo/bar/1/a', None), None)
+
+    def test_eviction(self):
+        index = jsonpointer.PointerIndex(self.doc, maxsize=3)
+        index.resolve('/foo/bar/1/a')
+        index.resolve('/baz')
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.info().evictions, 2)
+        self.assertEqual(index.resolve('/foo/bar/1/a'), 2)
+
+        self.assertRaises(ValueError, jsonpointer.PointerIndex, {}, 0)
+
+    def test_invalidate_below_evicted(self):
+        # /foo is evicted, but the nodes below it are still recorded
+        index = jsonpointer.PointerIndex(self.doc, maxsize=3)
+        index.resolve('/foo/bar/1/a')
+        index.resolve('/foo/bar/0')
+        self.assertEqual(len(index), 3)
+
+        self.doc['foo'] = {'bar': []}
+        index.invalidate('/foo')
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.resolve('/foo/bar/1', None), None)
+
+        # the pruned trie holds nothing of the invalidated subtree
+        index.invalidate('/foo')
+        self.assertEqual(index._trie, [{}, None])
+
+
+class IterPointersTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {
+            'foo': ['bar', {'a/b': 1, 'm~n': [[], {}]}],
+            '': 0,
+            'baz': 'str',
+            'num': {'0': 'x', '1': 'y'},
+        }
+
+    def test_all_nodes(self):
+        pointers = list(jsonpointer.iter_pointers(self.doc))
+        self.assertEqual(pointers[0], (JsonPointer(''), self.doc))
+        self.assertEqual(
+            [ptr.path for ptr, _ in pointers],
+            ['', '/foo', '/foo/0', '/foo/1', '/foo/1/a~1b', '/foo/1/m~0n',
+             '/foo/1/m~0n/0', '/foo/1/m~0n/1', '/', '/baz', '/num', '/num/0',
+             '/num/1'])
+
+        for ptr, value in pointers:
+            self.assertIs(ptr.resolve(self.doc), value)
+            self.assertEqual(ptr, JsonPointer(ptr.path))
+            self.assertEqual(ptr, JsonPointer.from_parts(ptr.parts))
+
+    def test_leaves_only(self):
+        paths = [path for path, _ in
+                 jsonpointer.iter_pointers(self.doc, leaves_only=True, as_strings=True)]
+        self.assertEqual(paths, ['/foo/0', '/foo/1/a~1b', '/foo/1/m~0n/0',
+                                 '/foo/1/m~0n/1', '/', '/baz', '/num/0', '/num/1'])
+
+    def test_max_depth(self):
+        paths = [path for path, _ in
+                 jsonpointer.iter_pointers(self.doc, max_depth=1, as_strings=True)]
+        self.assertEqual(paths, ['', '/foo', '/', '/baz', '/num'])
+
+        flat = jsonpointer.flatten(self.doc, max_depth=2)
+        self.assertEqual(flat['/foo/1'], self.doc['foo'][1])
+        self.assertEqual(jsonpointer.flatten(self.doc, max_depth=0), {'': self.doc})
+
+    def test_scalars_and_empty(self):
+        for doc in [1, 'abc', None, [], {}]:
+            self.assertEqual(jsonpointer.flatten(doc), {'': doc})
+            self.assertEqual(jsonpointer.unflatten(jsonpointer.flatten(doc)), doc)
+
+    def test_deep(self):
+        doc = leaf = {}
+        for _ in range(5000):
+            child = {}
+            leaf['a'] = [child]
+            leaf = child
+        flat = jsonpointer.flatten(doc)
+        self.assertEqual(list(flat), ['/a/0' * 5000])
+
+    def test_round_trip(self):
+        flat = jsonpointer.flatten(self.doc)
+        self.assertEqual(flat['/foo/1/m~0n/0'], [])
+        # the object with keys "0" and "1" cannot be told from a list
+        expected = copy.deepcopy(self.doc)
+        expected['num'] = ['x', 'y']
+        self.assertEqual(jsonpointer.unflatten(flat), expected)
+        self.assertEqual(jsonpointer.unflatten(flat.items()), expected)
+
+    def test_unflatten_errors(self):
+        self.assertRaises(JsonPointerException, jsonpointer.unflatten,
+                          [('/a', 1), ('/a/b', 2)])
+        self.assertRaises(JsonPointerException, jsonpointer.unflatten,
+                          [('/a', 1), ('/a', 2)])
+        self.assertRaises(JsonPointerException, jsonpointer.unflatten,
+                          [('/a', 1), ('', 2)])
+        self.assertRaises(JsonPointerException, jsonpointer.unflatten,
+                          [('/a', {}), ('/a/b', 2)])
+
+
+class DocumentStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {'a': {'x': 1}, 'b': [1, 2, 3], 'c': {'y': {'z': 2}}}
+        self.store = jsonpointer.DocumentStore(self.doc)
+
+    def test_copy_on_write(self):
+        original = copy.deepcopy(self.doc)
+        snapshot = self.store.snapshot()
+
+        self.store.set('/a/x', 2)
+        self.store.set('/b/-', 4)
+        self.store.delete('/b/0')
+        self.assertEqual(self.store.update('/a/x', lambda x: x * 10), 20)
+        self.assertEqual(self.store.update('/a/new', lambda x: [x], None), [None])
+
+        self.assertIs(snapshot, self.doc)
+        self.assertEqual(self.doc, original)
+        self.assertEqual(self.store.snapshot(),
+                         {'a': {'x': 20, 'new': [None]}, 'b': [2, 3, 4], 'c': {'y': {'z': 2}}})
+        # untouched subtrees are shared
+        self.assertIs(self.store.snapshot()['c'], self.doc['c'])
+        self.assertEqual(self.store.get('/b/2'), 4)
+
+    def test_root(self):
+        self.store.set('', {'new': 1})
+        self.assertEqual(self.store.resolve('/new'), 1)
+        self.assertRaises(JsonPointerException, self.store.delete, '')
+
+    def test_failed_write(self):
+        snapshot = self.store.snapshot()
+        self.assertRaises(JsonPointerException, self.store.set, '/nope/x', 1)
+        self.assertRaises(JsonPointerException, self.store.delete, '/a/nope')
+        self.assertIs(self.store.snapshot(), snapshot)
+        # the locks have been released
+        self.store.acquire('', blocking=False)
+        self.store.release('')
+
+    def test_conflicts(self):
+        import threading
+
+        acquired = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with self.store.lock('/c/y'):
+                acquired.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        acquired.wait()
+        try:
+            for ptr in ['', '/c', '/c/y', '/c/y/z']:
+                self.assertRaises(jsonpointer.ConflictError, self.store.acquire, ptr, blocking=False)
+            self.assertRaises(jsonpointer.ConflictError, self.store.acquire, '/c', timeout=0.01)
+
+            # disjoint subtrees can be locked and written
+            with self.store.lock('/c/w', blocking=False):
+                self.store.set('/c/w', 1)
+            self.store.set('/a/x', 2)
+        finally:
+            release.set()
+            thread.join()
+
+        with self.store.lock('', blocking=False):
+            pass
+
+    def test_reentrant(self):
+        with self.store.lock('/a'):
+            with self.store.lock('/a'):
+                self.store.set('/a/x', 5)
+            self.store.update('/a/x', lambda x: x + 1)
+        self.assertEqual(self.store.resolve('/a/x'), 6)
+        self.assertRaises(RuntimeError, self.store.release, '/a')
+
+    def test_concurrent_updates(self):
+        import concurrent.futures
+
+        store = jsonpointer.DocumentStore({'counters': {str(i): 0 for i in range(4)}})
+
+        def increment(i):
+            store.update('/counters/%d' % (i % 4), lambda n: n + 1)
+            store.update('/counters', lambda c: dict(c, total=c.get('total', 0) + 1))
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            list(executor.map(increment, range(400)))
+
+        self.assertEqual(store.snapshot()['counters'],
+                         {'0': 100, '1': 100, '2': 100, '3': 100, 'total': 400})
+
+
+class PatternTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {
+            'items': [
+                {'price': 1, 'tags': ['a', 'b']},
+                {'price': 2},
+                {'cost': 3, 'price': {'price': 5}},
+                {'price': 4, 'tags': []},
+            ],
+            '*': 'star',
+            'a/b': {'c': 6},
+        }
+
+    def matches(self, pattern):
+        return [(ptr.path, value) for ptr, value in
+                jsonpointer.iter_matches(self.doc, pattern)]
+
+    def test_plain_pointers(self):
+        for path in ['', '/items/0/price', '/a~1b/c', '/items/2/price/price']:
+            self.assertEqual(self.matches(path),
+                             [(path, resolve_pointer(self.doc, path))])
+        for path in ['/items/9', '/items/-', '/nope/x', '/items/0/price/x']:
+            self.assertEqual(self.matches(path), [])
+
+    def test_wildcard(self):
+        self.assertEqual(self.matches('/items/*/price'), [
+            ('/items/0/price', 1), ('/items/1/price', 2),
+            ('/items/2/price', {'price': 5}), ('/items/3/price', 4)])
+        self.assertEqual(self.matches('/items/*/tags/*'), [
+            ('/items/0/tags/0', 'a'), ('/items/0/tags/1', 'b')])
+        self.assertEqual([path for path, _ in self.matches('/*')],
+                         ['/items', '/*', '/a~1b'])
+        self.assertEqual(self.matches('/*/c'), [('/a~1b/c', 6)])
+
+    def test_slices(self):
+        def prices(pattern):
+            return [value for _, value in self.matches(pattern)]
+
+        self.assertEqual(prices('/items/1:3/price'), [2, {'price': 5}])
+        self.assertEqual(prices('/items/::2/price'), [1, {'price': 5}])
+        self.assertEqual(prices('/items/-1:/price'), [4])
+        self.assertEqual(prices('/items/::-1/price'), [4, {'price': 5}, 2, 1])
+        self.assertEqual(prices('/items/:/cost'), [3])
+        self.assertEqual(prices('/items/5:9'), [])
+        # slices are member names of objects
+        self.assertEqual(jsonpointer.JsonPointerPattern('/1:2').resolve({'1:2': 0}), [0])
+        self.assertRaises(JsonPointerException, jsonpointer.JsonPointerPattern, '/::0')
+
+    def test_descent(self):
+        self.assertEqual(self.matches('/**/price/price'),
+                         [('/items/2/price/price', 5)])
+        self.assertEqual([path for path, _ in self.matches('/**/price')], [
+            '/items/0/price', '/items/1/price', '/items/2/price',
+            '/items/2/price/price', '/items/3/price'])
+        # consecutive descents do not repeat matches
+        self.assertEqual(self.matches('/**/**/cost'), [('/items/2/cost', 3)])
+        self.assertEqual(len(self.matches('/**')),
+                         len(list(jsonpointer.iter_pointers(self.doc))))
+
+    def test_lazy(self):
+        pattern = jsonpointer.JsonPointerPattern('/*/price')
+        doc = {'k%d' % i: {'price': i} for i in range(100000)}
+        matches = pattern.iter_matches(doc)
+        self.assertEqual(next(matches)[1], 0)
+        self.assertEqual(next(matches)[1], 1)
+
+    def test_pointers(self):
+        for ptr, value in jsonpointer.iter_matches(self.doc, '/**'):
+            self.assertIsInstance(ptr, JsonPointer)
+            self.assertIs(ptr.resolve(self.doc), value)
+
+    def test_str_eq(self):
+        pattern = jsonpointer.JsonPointerPattern('/items/*')
+        self.assertEqual(str(pattern), '/items/*')
+        self.assertEqual(repr(pattern), "JsonPointerPattern('/items/*')")
+        self.assertEqual(pattern, jsonpointer.JsonPointerPattern('/items/*'))
+        self.assertNotEqual(pattern, '/items/*')
+        self.assertEqual(len({pattern, jsonpointer.JsonPointerPattern('/items/*')}), 1)
+
+
+class PointerAlgebraTests(unittest.TestCase):
+
+    def test_join(self):
+        ptr = JsonPointer('/a~1b')
+        joined = ptr.join(JsonPointer('/c/~0'))
+        self.assertEqual(joined.parts, ('a/b', 'c', '~'))
+        self.assertEqual(joined.path, '/a~1b/c/~0')
+        self.assertEqual((ptr / [0, '~']).path, '/a~1b/0/~0')
+        self.assertEqual((JsonPointer.from_parts(['x']) / '/y').path, '/x/y')
+        self.assertRaises(JsonPointerException, ptr.join, 1)
+
+    def test_parent(self):
+        self.assertEqual(JsonPointer('/a/b~1c').parent, JsonPointer('/a'))
+        self.assertEqual(JsonPointer('/a/b~1c').parent.parent.path, '')
+        self.assertEqual(JsonPointer.from_parts(['a/b', 'c']).parent.path, '/a~1b')
+        self.assertRaises(JsonPointerException, getattr, JsonPointer(''), 'parent')
+
+    def test_common_prefix(self):
+        a = JsonPointer('/a/b/c')
+        self.assertEqual(a.common_prefix(JsonPointer('/a/b/d')), JsonPointer('/a/b'))
+        self.assertIs(a.common_prefix(JsonPointer('/a/b/c/d')), a)
+        prefix = JsonPointer('/a')
+        self.assertIs(a.common_prefix(prefix), prefix)
+        self.assertEqual(a.common_prefix(JsonPointer('/x')), JsonPointer(''))
+
+    def test_contains(self):
+        a = JsonPointer('/a/b')
+        self.assertTrue(a.contains(a))
+        self.assertTrue(a.contains(JsonPointer('')))
+        self.assertFalse(a.contains(JsonPointer('/a/b/c')))
+        self.assertFalse(a.contains(JsonPointer('/a/c')))
+
+    def test_relative_to(self):
+        cases = [
+            ('/a/b', '/a/b', '0'),
+            ('/a/b/c', '/a/b', '0/c'),
+            ('/a', '/a/b/c', '2'),
+            ('/a/x~1y', '/a/b/c', '2/x~1y'),
+            ('', '/a', '1'),
+        ]
+        for target, base, expected in cases:
+            rel = JsonPointer(target).relative_to(JsonPointer(base))
+            self.assertEqual(str(rel), expected)
+            self.assertEqual(rel.to_absolute(JsonPointer(base)), JsonPointer(target))
+
+
+class RelativePointerTests(unittest.TestCase):
+
+    # the examples from the draft
+    doc = {
+        'foo': ['bar', 'baz'],
+        'highly': {'nested': {'objects': True}},
+    }
+
+    def test_draft_examples(self):
+        location = JsonPointer('/foo/1')
+        cases = [
+            ('0', 'baz'),
+            ('1/0', 'bar'),
+            ('0-1', 'bar'),
+            ('2/highly/nested/objects', True),
+            ('0#', 1),
+            ('0-1#', 0),
+            ('1#', 'foo'),
+        ]
+        for rel, expected in cases:
+            self.assertEqual(jsonpointer.RelativeJsonPointer(rel).resolve(self.doc, location), expected)
+
+        location = JsonPointer('/highly/nested')
+        cases = [
+            ('0/objects', True),
+            ('1/nested/objects', True),
+            ('2/foo/0', 'bar'),
+            ('0#', 'nested'),
+            ('1#', 'highly'),
+        ]
+        for rel, expected in cases:
+            self.assertEqual(jsonpointer.RelativeJsonPointer(rel).resolve(self.doc, location), expected)
+
+    def test_parse(self):
+        rel = jsonpointer.RelativeJsonPointer('2+3/a~1b')
+        self.assertEqual((rel.levels, rel.index_offset, rel.pointer), (2, 3, JsonPointer('/a~1b')))
+        self.assertEqual(str(rel), '2+3/a~1b')
+        self.assertEqual(repr(rel), "RelativeJsonPointer('2+3/a~1b')")
+        self.assertIsNone(jsonpointer.RelativeJsonPointer('1#').pointer)
+        self.assertEqual(jsonpointer.RelativeJsonPointer('0-0'), jsonpointer.RelativeJsonPointer('0+0'))
+
+        for invalid in ['', '/a', '-1', '01', '1#/a', '1a', '1+', '1+01', '1~']:
+            self.assertRaises(JsonPointerException, jsonpointer.RelativeJsonPointer, invalid)
+
+    def test_errors(self):
+        location = JsonPointer('/foo/1')
+        for rel in ['3', '0-2', '1+1', '2#', '1/nope', '0+1']:
+            rel = jsonpointer.RelativeJsonPointer(rel)
+            self.assertRaises(JsonPointerException, rel.resolve, self.doc, location)
+            self.assertIsNone(rel.resolve(self.doc, location, None))
+
+        self.assertRaises(JsonPointerException,
+                          jsonpointer.RelativeJsonPointer('0#').to_absolute, location)
+
+    def test_pickle(self):
+        rel = jsonpointer.RelativeJsonPointer('1-1/x')
+        self.assertEqual(pickle.loads(pickle.dumps(rel)), rel)
+        self.assertEqual(len({rel, jsonpointer.RelativeJsonPointer('1-1/x')}), 1)
+
+
+class PointerSetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = ['/a', '/a/b/c', '/a/b/d', '/x/0', '', '/a~1b']
+
+    def test_set(self):
+        pointers = jsonpointer.PointerSet(self.paths)
+        self.assertEqual(len(pointers), 6)
+        for path in self.paths:
+            self.assertIn(path, pointers)
+            self.assertIn(JsonPointer(path), pointers)
+        for path in ['/a/b', '/x', '/a/b/c/d', '/b']:
+            self.assertNotIn(path, pointers)
+
+        pointers.add('/a/b/c')
+        self.assertEqual(len(pointers), 6)
+        self.assertEqual(pointers, {JsonPointer(path) for path in self.paths})
+
+    def test_iteration_order(self):
+        pointers = jsonpointer.PointerSet(self.paths)
+        self.assertEqual([ptr.path for ptr in pointers],
+                         ['', '/a', '/a/b/c', '/a/b/d', '/x/0', '/a~1b'])
+
+    def test_discard(self):
+        pointers = jsonpointer.PointerSet(self.paths)
+        pointers.discard('/a/b/c')
+        pointers.discard('/a/b')
+        pointers.discard('/nope/x')
+        self.assertEqual(len(pointers), 5)
+        self.assertNotIn('/a/b/c', pointers)
+        self.assertIn('/a/b/d', pointers)
+
+        pointers.discard('/a/b/d')
+        # empty branches are pruned
+        self.assertEqual(pointers._root[0]['a'], [{}, JsonPointer('/a')])
+        self.assertRaises(KeyError, pointers.remove, '/a/b/d')
+
+        pointers.clear()
+        self.assertEqual(len(pointers), 0)
+        self.assertEqual(list(pointers), [])
+
+    def test_prefix_queries(self):
+        pointers = jsonpointer.PointerSet(['/a', '/a/b/c', '/x/0'])
+        self.assertEqual(pointers.longest_prefix('/a/b/c/d'), JsonPointer('/a/b/c'))
+        self.assertEqual(pointers.longest_prefix('/a/b/x'), JsonPointer('/a'))
+        self.assertEqual(pointers.longest_prefix('/a'), JsonPointer('/a'))
+        self.assertIsNone(pointers.longest_prefix('/x'))
+        self.assertIsNone(pointers.longest_prefix(''))
+
+        self.assertTrue(pointers.covers('/x/0/1'))
+        self.assertFalse(pointers.covers('/x/1'))
+
+        pointers.add('')
+        self.assertEqual(pointers.longest_prefix('/y'), JsonPointer(''))
+
+    def test_under(self):
+        pointers = jsonpointer.PointerSet(self.paths)
+        self.assertEqual([ptr.path for ptr in pointers.under('/a')],
+                         ['/a', '/a/b/c', '/a/b/d'])
+        self.assertEqual([ptr.path for ptr in pointers.under('/a/b')],
+                         ['/a/b/c', '/a/b/d'])
+        self.assertEqual(list(pointers.under('/b')), [])
+        self.assertEqual(len(list(pointers.under(''))), 6)
+
+    def test_set_operations(self):
+        a = jsonpointer.PointerSet(['/a', '/b'])
+        b = jsonpointer.PointerSet(['/b', '/c'])
+        self.assertIsInstance(a | b, jsonpointer.PointerSet)
+        self.assertEqual(sorted(ptr.path for ptr in a & b), ['/b'])
+        self.assertEqual(sorted(ptr.path for ptr in a - b), ['/a'])
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = {'a': [1, {'b': 2}], 'c': 3}
+        self.events = []
+        jsonpointer.enable_instrumentation(self.events.append)
+
+    def tearDown(self):
+        jsonpointer.disable_instrumentation()
+
+    def test_resolve(self):
+        self.assertEqual(resolve_pointer(self.doc, '/a/1/b'), 2)
+        event, = self.events
+        self.assertEqual(event.operation, 'resolve')
+        self.assertEqual(event.pointer, JsonPointer('/a/1/b'))
+        self.assertEqual(event.steps, 3)
+        self.assertEqual(event.node_types, ('dict', 'list', 'dict'))
+        self.assertIsNone(event.failure)
+        self.assertTrue(event.duration >= 0)
+
+        JsonPointer('').get(self.doc)
+        self.assertEqual(self.events[1][3:], (0, (), None))
+
+    def test_failures(self):
+        cases = [
+            ('/x', 'missing-member', 0),
+            ('/a/x', 'invalid-index', 1),
+            ('/a/5', 'out-of-bounds', 1),
+            ('/c/x', 'not-a-container', 1),
+            ('/a/-/x', 'not-a-container', 2),
+        ]
+        for path, failure, steps in cases:
+            self.assertRaises(JsonPointerException, resolve_pointer, self.doc, path)
+            self.assertIsNone(resolve_pointer(self.doc, path, None))
+            for event in self.events[-2:]:
+                self.assertEqual((event.failure, event.steps), (failure, steps))
+
+    def test_set_and_delete(self):
+        set_pointer(self.doc, '/a/1/new', 4)
+        jsonpointer.delete_pointer(self.doc, '/a/1/new')
+        set_pointer(self.doc, '/a/-', 5, inplace=False)
+        self.assertRaises(JsonPointerException, set_pointer, self.doc, '/x/y', 1)
+        self.assertRaises(JsonPointerException, jsonpointer.delete_pointer, self.doc, '/a/1/new')
+
+        self.assertEqual([(e.operation, e.steps, e.failure) for e in self.events], [
+            ('set', 3, None),
+            ('delete', 3, None),
+            ('set', 2, None),
+            ('set', 0, 'missing-member'),
+            ('delete', 2, 'missing-member'),
+        ])
+
+    def test_disable(self):
+        jsonpointer.disable_instrumentation()
+        jsonpointer.disable_instrumentation()
+        resolve_pointer(self.doc, '/a')
+        self.assertEqual(self.events, [])
+        self.assertIs(JsonPointer.get, JsonPointer.resolve)
+
+    def test_stats(self):
+        stats = jsonpointer.PointerStats()
+        jsonpointer.enable_instrumentation(stats, self.events.append)
+        jsonpointer.enable_pointer_cache()
+        try:
+            for path in ['/a/0', '/a/0', '/nope', '/c']:
+                resolve_pointer(self.doc, path, None)
+            set_pointer(self.doc, '/c', 4)
+            summary = stats.summary()
+        finally:
+            jsonpointer.disable_pointer_cache()
+
+        self.assertEqual(len(self.events), 5)
+        self.assertEqual(stats.calls, {'resolve': 4, 'set': 1})
+        self.assertEqual(stats.steps, {'resolve': 5, 'set': 1})
+        self.assertEqual(stats.node_types, {'dict': 5, 'list': 2})
+        self.assertEqual(stats.failures, {'missing-member': 1})
+        self.assertEqual(summary['calls'], {'resolve': 4, 'set': 1})
+        self.assertEqual(summary['cache']['hits'], 2)
+        self.assertTrue(summary['time']['resolve'] > 0)
+
+        stats.clear()
+        self.assertEqual(stats.calls, {})
+
+    def test_threads(self):
+        import concurrent.futures
+
+        stats = jsonpointer.PointerStats()
+        jsonpointer.enable_instrumentation(stats)
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            for _ in executor.map(lambda i: resolve_pointer(self.doc, '/a/%d' % (i % 3), None),
+                                  range(1000)):
+                pass
+
+        self.assertEqual(stats.calls['resolve'], 1000)
+        self.assertEqual(sum(stats.failures.values()), 333)
+
+
 class AltTypesTests(unittest.TestCase):
     class Node(object):
         def __init__(self, name, parent=None):
@@ -394,6 +1943,186 @@ class AltTypesTests(unittest.TestCase):
         self.assertRaises(JsonPointerException, resolve_pointer, doc, '/root/1/2/3/4')
 
 
+class CommandLineTests(unittest.TestCase):
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin', 'jsonpointer')
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = self.write('records.jsonl', '{"l": [1, 2], "a": 1}\n{"l": {"-": 3}}\n')
+
+    def write(self, name, content):
+        """Writes a file (content is JSON text, or a document); returns its path"""
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(content if isinstance(content, str) else json.dumps(content))
+        return path
+
+    def run_script(self, *args, stdin=''):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, [os.path.dirname(jsonpointer.__file__), env.get('PYTHONPATH')]))
+        return subprocess.run([sys.executable, self.script] + list(args), input=stdin,
+                              capture_output=True, text=True, env=env)
+
+    def test_lines_end_of_list(self):
+        result = self.run_script('--lines', '-p', '/l/-', '-p', '/a', self.path)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, '{"/a": 1}\n{"/l/-": 3}\n')
+
+        result = self.run_script('--lines', '--format', 'tsv', '-p', '/l/-', '-p', '/a',
+                                 self.path, '-', '-', stdin='{"l": []}\n')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, '\t1\n3\t\n\t\n')
+
+    def test_index_missing(self):
+        path = self.write('doc.json', {'a': {'b': [1, 2]}})
+
+        for ptr in ['/a/b/7', '/a/b/-', '/a/b/0/x']:
+            result = self.run_script('--index', ptr, path)
+            self.assertEqual(result.returncode, 1)
+            self.assertEqual(result.stderr,
+                             "Could not resolve pointer: '%s' not found in the JSON input\n" % ptr)
+
+        result = self.run_script('--index', '/a/b/1', path)
+        self.assertEqual((result.returncode, result.stdout), (0, '2\n'))
+
+    def test_exit_status(self):
+        result = self.run_script('/a', self.path, os.path.join(self.path, 'missing'))
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('Could not read', result.stderr)
+
+    def test_jobs_order(self):
+        # the large file takes much longer than stdin, which is resolved by
+        # the main process, and the small file
+        large = self.write('large.json', {'a': 'large', 'pad': ['x' * 100] * 50000})
+        small = self.write('small.json', {'a': 'small'})
+        args = ['-j', '2', '/a', large, '-', small]
+
+        result = self.run_script('--order', 'input', *args, stdin='{"a": "stdin"}')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, '"large"\n"stdin"\n"small"\n')
+
+        result = self.run_script('--order', 'completion', *args, stdin='{"a": "stdin"}')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = result.stdout.splitlines()
+        self.assertEqual(sorted(lines), ['"large"', '"small"', '"stdin"'])
+        self.assertEqual(lines[0], '"stdin"')
+
+    def test_jobs_errors(self):
+        paths = [self.write('a.json', {'a': 1}), self.write('bad.json', '{"a": '),
+                 os.path.join(self.dir, 'missing.json'), self.write('b.json', {'a': 2}),
+                 self.write('c.json', {'b': 3})]
+        result = self.run_script('-j', '3', '/a', *paths)
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout, '1\n2\n')
+        errors = result.stderr.splitlines()
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(errors[0].startswith('Could not read %s: ' % paths[1]))
+        self.assertTrue(errors[1].startswith('Could not read %s: ' % paths[2]))
+        self.assertTrue(errors[2].startswith('Could not resolve pointer: '))
+
+    def test_jobs_cached(self):
+        paths = [self.write('f%d.json' % i, {'a': i}) for i in range(4)]
+        cache_db = os.path.join(self.dir, 'cache.sqlite')
+        args = ['--cache-db', cache_db, '-j', '2', '/a']
+
+        result = self.run_script(*args, *paths[:2])
+        self.assertEqual((result.returncode, result.stdout), (0, '0\n1\n'))
+
+        # same size and modification time, so the cached result is used
+        self.rewrite_unchanged(paths[0], {'a': 7})
+        result = self.run_script(*args, *paths, '-', stdin='{"a": "stdin"}')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, '0\n1\n2\n3\n"stdin"\n')
+
+    def run_cached(self, *args, **kwargs):
+        return self.run_script('--cache-db', os.path.join(self.dir, 'cache.sqlite'),
+                               *args, **kwargs)
+
+    def cached_paths(self):
+        import sqlite3
+        db = sqlite3.connect(os.path.join(self.dir, 'cache.sqlite'))
+        try:
+            return sorted(os.path.basename(row[0])
+                          for row in db.execute('SELECT path FROM results'))
+        finally:
+            db.close()
+
+    def test_cache_hit(self):
+        path = self.write('doc.json', {'a': 1, 'b': 1})
+        self.assertEqual(self.run_cached('/a', path).stdout, '1\n')
+
+        self.rewrite_unchanged(path, {'a': 2, 'b': 2})
+        result = self.run_cached('/a', path)
+        self.assertEqual((result.returncode, result.stdout, result.stderr), (0, '1\n', ''))
+
+        # results are cached per pointer
+        self.assertEqual(self.run_cached('/b', path).stdout, '2\n')
+
+    def test_cache_invalidation(self):
+        path = self.write('doc.json', {'a': 1})
+        self.assertEqual(self.run_cached('/a', path).stdout, '1\n')
+
+        # a different size
+        self.write('doc.json', {'a': 10})
+        self.assertEqual(self.run_cached('/a', path).stdout, '10\n')
+
+        # the same size, but a different modification time
+        stat = os.stat(path)
+        self.write('doc.json', {'a': 20})
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.run_cached('/a', path).stdout, '20\n')
+        self.assertEqual(self.cached_paths(), ['doc.json'])
+
+    def test_cache_output_options(self):
+        path = self.write('doc.json', '{"a": {"b":1}}')
+        outputs = ['{"b": 1}\n', '{"b":1}\n', '{\n  "b": 1\n}\n']
+        runs = [[], ['--raw'], ['--indent', '2']]
+        for args, output in zip(runs, outputs):
+            self.assertEqual(self.run_cached(*args, '/a', path).stdout, output)
+
+        # every output is cached separately
+        self.rewrite_unchanged(path, '{"a": {"c":2}}')
+        for args, output in zip(runs, outputs):
+            self.assertEqual(self.run_cached(*args, '/a', path).stdout, output)
+
+    def test_cache_eviction(self):
+        import sqlite3
+        paths = [self.write('f%d.json' % i, {'a': i}) for i in range(4)]
+
+        result = self.run_cached('--cache-entries', '2', '/a', *paths[:3])
+        self.assertEqual(result.stdout, '0\n1\n2\n')
+        # the least recently used entries are evicted
+        self.assertEqual(self.cached_paths(), ['f1.json', 'f2.json'])
+
+        # so are entries that have not been used for --cache-age seconds
+        db = sqlite3.connect(os.path.join(self.dir, 'cache.sqlite'))
+        with db:
+            db.execute("UPDATE results SET accessed = 0 WHERE path LIKE '%f1.json'")
+        db.close()
+        self.run_cached('--cache-age', '3600', '/a', paths[3])
+        self.assertEqual(self.cached_paths(), ['f2.json', 'f3.json'])
+
+    def test_cache_unusable(self):
+        path = self.write('doc.json', {'a': 1})
+        self.write('cache.sqlite', 'not a database' * 100)
+
+        result = self.run_cached('/a', path)
+        self.assertEqual((result.returncode, result.stdout), (0, '1\n'))
+        self.assertTrue(result.stderr.startswith('Not using the result cache: '))
+
+    def rewrite_unchanged(self, path, doc):
+        """Rewrites path with doc (or JSON text), keeping its size and modification time"""
+        stat = os.stat(path)
+        content = doc if isinstance(doc, str) else json.dumps(doc)
+        self.assertEqual(len(content), stat.st_size)
+        self.write(os.path.basename(path), content)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
 def load_tests(loader, tests, ignore):
     tests.addTests(doctest.DocTestSuite(jsonpointer))
     return tests